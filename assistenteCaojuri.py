@@ -1,28 +1,28 @@
 import streamlit as st
-import tempfile
-from langchain.memory import ConversationBufferMemory
 
 import sqlite3
 from datetime import datetime
 import uuid
 import pandas as pd
-import plotly.express as px
-import json
+import importlib
+import itertools
 
-
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
+# plotly, os SDKs dos provedores e o langchain só são importados quando usados
 #from langchain_deepseek import ChatDeepSeek
 
 from loaders import mostrar_opcoes_download
-from loaders import carrega_site, carrega_youtube, carrega_csv, carrega_pdf, carrega_txt, transcrever_mp4, carrega_notion, carrega_google_drive
+from loaders import carrega_site, carrega_youtube, iniciar_transcricao_mp4, carrega_notion, carrega_google_drive
+from loaders import consulta_notion_pergunta, resposta_estruturada_notion, esquecer_banco_notion
+import cache_extracao
+from ingestao import extrair_em_paralelo
+from cache_recursos import RECURSOS, impressao_digital
+from uploads import hash_upload, salvar_upload
+from corpus import Corpus, documento_de_texto
+from memoria_sessao import MemoriaSessao, MODOS_MEMORIA, MODO_PADRAO
+from recuperacao import formata_contexto, TOP_K_TRECHOS
+from orcamento_tokens import OrcamentoPrompt, JANELA_PADRAO
 import os
 from dotenv import load_dotenv
-from notion_client import Client
-
-
-from langchain.prompts import ChatPromptTemplate
 
 st.set_page_config(
     page_title='JúrIA - Assistente Virtual do CAOJÚRI',
@@ -121,6 +121,7 @@ def dashboard_acessos():
         # Gráfico de acessos por dia
         acessos_por_dia = df.groupby('data').size().reset_index(name='acessos')
         if len(acessos_por_dia) > 1:
+            import plotly.express as px
             fig = px.line(acessos_por_dia, x='data', y='acessos', 
                          title='Acessos por Dia')
             st.plotly_chart(fig, use_container_width=True)
@@ -160,95 +161,260 @@ CONFIG_MODELOS = {  'OpenAI':
                             #{'modelos': ['gpt-4o-mini', 'gpt-4o'],
                             #{'modelos': ['gpt-5-nano-2025-08-07', 'gpt-5-mini-2025-08-07','gpt-5-2025-08-07','gpt-4.1-nano', 'gpt-4.1-mini', 'gpt-4.1'],
                             {'modelos': ['gpt-4.1-nano', 'gpt-4.1-mini', 'gpt-4.1'],
-                            'chat': ChatOpenAI},
+                            'janelas': {'gpt-4.1-nano': 1047576, 'gpt-4.1-mini': 1047576, 'gpt-4.1': 1047576},
+                            'chat': 'langchain_openai:ChatOpenAI'},
                     'Anthropic':
                             
                             #{'modelos':['claude-3-5-haiku-20241022','claude-3-5-sonnet-20241022'],
                             {'modelos':['claude-3-5-haiku-20241022','claude-sonnet-4-20250514'],
-                            'chat':ChatAnthropic},
+                            'janelas': {'claude-3-5-haiku-20241022': 200000, 'claude-sonnet-4-20250514': 200000},
+                            'chat': 'langchain_anthropic:ChatAnthropic'},
                     'Google':
                             #{'modelos':['gemini-2.0-flash', 'gemini-2.0-flash-lite-preview-02-05', 'gemini-1.5-flash', 'gemini-1.5-pro'],
                             {'modelos':['gemini-2.5-flash', 'gemini-2.5-flash-lite-preview', 'gemini-2.5-pro'],
-                            'chat': ChatGoogleGenerativeAI}
-                    #'DeepSeek': {'modelos':['-'],'chat': ChatDeepSeek}
+                            'janelas': {'gemini-2.5-flash': 1048576, 'gemini-2.5-flash-lite-preview': 1048576, 'gemini-2.5-pro': 1048576},
+                            'chat': 'langchain_google_genai:ChatGoogleGenerativeAI'}
+                    #'DeepSeek': {'modelos':['-'],'chat': 'langchain_deepseek:ChatDeepSeek'}
 }
 
-MEMORIA = ConversationBufferMemory()
+SYSTEM_MESSAGE = ''' Você é JúrIA - Assitente Virtual do CAOJÚRI.
+    Você possui acesso aos seguintes trechos dos documentos carregados, selecionados por relevância para a pergunta:
+    
+    ####
+    {contexto}
+    ####
+    Utilize as informações fornecidas para basear suas respostas.
+
+    Sempre que houver $ na saída, substitua por S.
+
+    Se a informação do documento for algo como "Just a moment...Enable JavaScript and coockies to continue", sugira ao usuário carregar novamente de JúrIA!
+    '''
+
+
+def carrega_arquivos_locais(tipo_arquivo, arquivos):
+    """
+    Extrai o texto de vários arquivos enviados. Os que já estão no cache de
+    extração são lidos direto do disco; os demais são extraídos em paralelo,
+    gravados no cache e lidos de lá página por página.
+    Arquivos com erro são avisados na tela e ignorados.
+    """
+    chaves = []
+    pendentes = []  # (posição, caminho temporário)
+    for posicao, arq in enumerate(arquivos):
+        # Hash e gravação percorrem o buffer do upload em blocos, sem copiá-lo
+        chave = cache_extracao.chave_extracao(hash_upload(arq), tipo_arquivo)
+        chaves.append(chave)
+        if cache_extracao.abrir_paginas(chave) is None:
+            caminho, _ = salvar_upload(arq, sufixo=f'.{tipo_arquivo.split(".")[-1]}')
+            pendentes.append((posicao, caminho))
+
+    erros = {}
+    if pendentes:
+        barra = st.progress(0.0, text=f'Extraindo texto de {len(pendentes)} arquivo(s)...')
+
+        def ao_progredir(concluidas, total):
+            barra.progress(concluidas / total, text=f'Extraindo texto: {concluidas} de {total} arquivo(s)')
+
+        try:
+            tarefas = [(tipo_arquivo, caminho, chaves[posicao]) for posicao, caminho in pendentes]
+            resultados = extrair_em_paralelo(tarefas, ao_progredir)
+        finally:
+            for _, caminho in pendentes:
+                os.remove(caminho)
+        barra.empty()
+        erros = {posicao: erro for (posicao, _), (_, erro) in zip(pendentes, resultados) if erro is not None}
+
+    documentos = []
+    numerar = tipo_arquivo == 'Arquivos .pdf'
+    for posicao, (arq, chave) in enumerate(zip(arquivos, chaves)):
+        if posicao in erros:
+            st.warning(f'Não foi possível ler o arquivo {arq.name}: {erros[posicao]}')
+            continue
+        documentos.append((arq.name, chave, paginas_do_cache(arq, tipo_arquivo, chave, numerar)))
+    return documentos
+
+
+def paginas_do_cache(arq, tipo_arquivo, chave, numerar):
+    """
+    Páginas de um arquivo lidas em streaming do cache de extração. Se o item
+    sumir ou se mostrar corrompido no meio da leitura, o arquivo é extraído de
+    novo e a leitura continua da página em que parou.
+    """
+    lidas = 0
+    try:
+        paginas = cache_extracao.abrir_paginas(chave, numerar=numerar)
+        if paginas is None:
+            raise cache_extracao.ItemCorrompido('texto extraído não encontrado no cache')
+        for pagina in paginas:
+            yield pagina
+            lidas += 1
+        return
+    except cache_extracao.ItemCorrompido as e:
+        erro = str(e)
+
+    caminho, _ = salvar_upload(arq, sufixo=f'.{tipo_arquivo.split(".")[-1]}')
+    try:
+        [(_, erro_extracao)] = extrair_em_paralelo([(tipo_arquivo, caminho, chave)])
+    finally:
+        os.remove(caminho)
+    try:
+        paginas = None if erro_extracao else cache_extracao.abrir_paginas(chave, numerar=numerar)
+        if paginas is None:
+            raise cache_extracao.ItemCorrompido(erro_extracao or erro)
+        yield from itertools.islice(paginas, lidas, None)
+    except cache_extracao.ItemCorrompido as e:
+        st.warning(f'Não foi possível ler o arquivo {arq.name}: {e}')
+
 
 def carrega_arquivo (tipo_arquivo, arquivo):
+    """
+    Extrai o texto da fonte selecionada. Retorna uma lista de documentos
+    (nome da fonte, hash do conteúdo, páginas) no formato aceito pelo corpus.
+    """
     documentos = []
     
 
     if tipo_arquivo == 'Site':
         documento = carrega_site(arquivo)  
-        documentos.append(documento)  
+        documentos.append(documento_de_texto(arquivo, documento))
 
     elif tipo_arquivo == 'Youtube':
         documento = carrega_youtube(arquivo)
-        documentos.append(documento)  
+        documentos.append(documento_de_texto(arquivo, documento))
 
     elif tipo_arquivo == 'Google Drive':
         documento = carrega_google_drive(arquivo)
-        documentos.append(documento)
+        documentos.append(documento_de_texto(arquivo, documento))
 
-    elif tipo_arquivo in ['Arquivos .pdf', 'Arquivos .csv', 'Arquivos .txt', 'Arquivos .mp4']:
+    elif tipo_arquivo == 'Arquivos .mp4':
+        # A transcrição roda em segundo plano; o texto parcial entra no corpus
+        # à medida que os trechos ficam prontos (ver acompanha_transcricoes)
+        trabalhos = st.session_state.setdefault('transcricoes', {})
         for arq in arquivo: # Itera sobre a lista de arquivos
-            if tipo_arquivo == 'Arquivos .mp4':
-                # Para MP4, trabalhamos diretamente com o arquivo
-                transcricao, duracao = transcrever_mp4(arq)
-                documento = transcricao
-                nome_arquivo_base = arq.name.replace('.mp4', '')
-                st.session_state[f'mostrar_download_{nome_arquivo_base}'] = True
-                st.session_state[f'transcricao_{nome_arquivo_base}'] = transcricao
-                st.session_state[f'duracao_{nome_arquivo_base}'] = duracao
-            else:
-                with tempfile.NamedTemporaryFile(suffix=f'.{tipo_arquivo.split(".")[-1]}', delete=False) as temp:
-                    temp.write(arq.read())
-                    nome_temp = temp.name
-                if tipo_arquivo == 'Arquivos .pdf':
-                    documento = carrega_pdf(nome_temp)
-                elif tipo_arquivo == 'Arquivos .csv':
-                    documento = carrega_csv(nome_temp)
-                elif tipo_arquivo == 'Arquivos .txt':
-                    documento = carrega_txt(nome_temp)
-            documentos.append(documento)
+            try:
+                trabalhos[arq.name] = iniciar_transcricao_mp4(arq)
+            except Exception as e:
+                st.error(f'Não foi possível iniciar a transcrição de {arq.name}: {e}')
+
+    elif tipo_arquivo in ['Arquivos .pdf', 'Arquivos .csv', 'Arquivos .txt']:
+        documentos.extend(carrega_arquivos_locais(tipo_arquivo, arquivo))
 
     elif tipo_arquivo == 'Notion':
+          # Mesmo id usado por carrega_notion, para que a fonte possa ser removida depois
+          arquivo = arquivo or os.getenv('NOTION_PAGE_ID')
           documento = carrega_notion(arquivo)
-          documentos.append(documento)
+          documentos.append(documento_de_texto(f'Notion {arquivo}', documento))
 
     return documentos
 
 
-def carrega_modelo(provedor, modelo, api_key, tipo_arquivo, arquivo):
+def classe_chat(provedor):
+    """Importa a classe de chat do provedor apenas quando ele é usado ('modulo:Classe' em CONFIG_MODELOS)."""
+    modulo, classe = CONFIG_MODELOS[provedor]['chat'].split(':')
+    return getattr(importlib.import_module(modulo), classe)
 
-    documento = carrega_arquivo(tipo_arquivo, arquivo)
-    
 
-    system_message = ''' Você é JúrIA - Assitente Virtual do CAOJÚRI.
-    Você possui acesso às seguintes informações vindas de um documento{}:
-    
-    ####
-    {}
-    ####
-    Utilize as informações fornecidas para basear suas respostas.
+def cria_chain(provedor, modelo, api_key):
+    """Monta o prompt e a chain, reaproveitando o cliente de chat já aberto para a mesma chave de API."""
+    from langchain_core.prompts import ChatPromptTemplate
 
-    Sempre que houver $ na saída, substitua por S.
-
-    Se a informação do documento for algo como "Just a moment...Enable JavaScript and coockies to continue", sugira ao usuário carregar novamente de JúrIA!
-    '''.format(tipo_arquivo, documento)
     template = ChatPromptTemplate.from_messages([
-        ('system', system_message),
+        ('system', SYSTEM_MESSAGE),
         ('placeholder', '{chat_history}'),
         ('user', '{input}')
     ])
 
-    chat = CONFIG_MODELOS[provedor]['chat'](model=modelo, api_key=api_key)
-    chain = template | chat
+    chave_cliente = ('chat', provedor, modelo, impressao_digital(api_key))
+    chat = RECURSOS.obter(chave_cliente, lambda: classe_chat(provedor)(model=modelo, api_key=api_key))
+    return template | chat
+
+
+def carrega_modelo(provedor, modelo, api_key, tipo_arquivo, arquivo):
+
+    # Cada fonte é dividida em trechos e indexada uma única vez; as fontes já
+    # presentes no corpus da sessão não são reprocessadas. A cada pergunta
+    # somente os trechos relevantes vão para o prompt
+    corpus = st.session_state.setdefault('corpus', Corpus())
+    for nome, hash_conteudo, paginas in carrega_arquivo(tipo_arquivo, arquivo):
+        corpus.adicionar(tipo_arquivo, nome, hash_conteudo, paginas)
+
+    janela = CONFIG_MODELOS[provedor].get('janelas', {}).get(modelo, JANELA_PADRAO)
+    st.session_state['orcamento'] = OrcamentoPrompt(modelo, janela=janela)
+
+    # Clientes e chains ficam aquecidos entre reinícios e entre sessões
+    chave_chain = ('chain', provedor, modelo, impressao_digital(api_key))
+    chain = RECURSOS.obter(chave_chain, lambda: cria_chain(provedor, modelo, api_key))
     st.session_state['chain'] = chain
     
 
 
+def obter_memoria():
+    """Memória da conversa desta sessão, criada na primeira utilização."""
+    memoria = st.session_state.get('memoria')
+    modo = st.session_state.get('modo_memoria', MODO_PADRAO)
+    if memoria is None:
+        memoria = st.session_state['memoria'] = MemoriaSessao(modo)
+    memoria.modo = modo
+    return memoria
+
+
+@st.fragment(run_every=2)
+def acompanha_transcricoes():
+    """
+    Mostra o progresso das transcrições em segundo plano (em segundos de áudio)
+    e reindexa apenas a fonte de cada uma quando chegam novos trechos, para que
+    o chat já responda sobre o que foi transcrito.
+    """
+    trabalhos = st.session_state.get('transcricoes', {})
+    versoes = st.session_state.setdefault('versoes_transcricoes', {})
+    corpus = st.session_state.setdefault('corpus', Corpus())
+    terminou = False
+    for nome, trabalho in list(trabalhos.items()):
+        # Versão lida antes do texto: um trecho que chegue entre as duas
+        # leituras muda a versão e é indexado na próxima execução
+        versao = trabalho.versao
+        if versao != versoes.get(nome):
+            ativo = trabalho.ativo
+            texto = trabalho.texto()
+            if texto:
+                _, hash_texto, paginas = documento_de_texto(nome, texto)
+                corpus.adicionar('Arquivos .mp4', nome, hash_texto, paginas, parcial=ativo)
+            versoes[nome] = versao
+
+        if trabalho.estado in ('aguardando', 'extraindo'):
+            st.progress(0.0, text=f'Extraindo o áudio de {nome}...')
+            continue
+        if trabalho.ativo:
+            st.progress(trabalho.progresso, text=(
+                f'Transcrevendo {nome}: {trabalho.segundos_concluidos / 60:.0f} de '
+                f'{trabalho.segundos_total / 60:.0f} min (já disponível para perguntas)'))
+            continue
+        if trabalho.estado == 'erro':
+            # Mostrado uma vez na página (fora do fragmento), e o trabalho sai da lista
+            st.session_state.setdefault('erros_transcricoes', {})[nome] = trabalho.erro
+            del trabalhos[nome]
+            versoes.pop(nome, None)
+            terminou = True
+            continue
+
+        # Transcrição completa: indexa o texto final (sem efeito se já
+        # indexado) e oferece os downloads
+        texto = trabalho.texto()
+        if texto:
+            _, hash_texto, paginas = documento_de_texto(nome, texto)
+            corpus.adicionar('Arquivos .mp4', nome, hash_texto, paginas)
+        nome_arquivo_base = nome.replace('.mp4', '')
+        st.session_state[f'mostrar_download_{nome_arquivo_base}'] = True
+        st.session_state[f'transcricao_{nome_arquivo_base}'] = texto
+        st.session_state[f'duracao_{nome_arquivo_base}'] = trabalho.duracao
+        st.session_state[f'segmentos_{nome_arquivo_base}'] = trabalho.segmentos()
+        del trabalhos[nome]
+        versoes.pop(nome, None)
+        terminou = True
+    if terminou:
+        st.rerun()
+
+
 def pagina_chat():
     st.header('⚖️ JúrIA - Assistente Virtual do CAOJÚRI')
 
@@ -261,34 +427,74 @@ def pagina_chat():
             if st.session_state.get(chave, False):
                 transcricao = st.session_state.get(f'transcricao_{nome_arquivo_base}', '')
                 duracao = st.session_state.get(f'duracao_{nome_arquivo_base}', 0)
-                mostrar_opcoes_download(nome_arquivo_base, transcricao, duracao)
+                segmentos = st.session_state.get(f'segmentos_{nome_arquivo_base}')
+                mostrar_opcoes_download(nome_arquivo_base, transcricao, duracao, segmentos)
         
         st.divider()
 
+    for nome, erro in st.session_state.pop('erros_transcricoes', {}).items():
+        st.error(f'Erro na transcrição de {nome}: {erro}')
+    if st.session_state.get('transcricoes'):
+        acompanha_transcricoes()
+
     chain = st.session_state.get('chain')
     if chain is None:
         st.error('⚠️ Carregue o arquivo ou digite a url antes de inicializar a JúrIA!')
         st.stop()
 
-    memoria = st.session_state.get('memoria', MEMORIA)
+    memoria = obter_memoria()
     for mensagem in memoria.buffer_as_messages:
         chat = st.chat_message(mensagem.type)
         chat.markdown(mensagem.content)
 
     input_usuario = st.chat_input('Fale com o Assistente!')
     if input_usuario:
-        memoria.chat_memory.add_user_message(input_usuario)
+        historico = memoria.mensagens_prompt()  # a pergunta atual vai em 'input'
+        memoria.adicionar_usuario(input_usuario)
         chat = st.chat_message('human')
         chat.markdown(input_usuario)
 
+        # Perguntas de contagem/filtro/agregação que citam um banco do Notion são
+        # respondidas na tabela local, e o modelo recebe só o resultado; se a
+        # pergunta não cita o banco, o resultado só complementa a busca
+        trechos, complementares = resposta_estruturada_notion(input_usuario)
+        if not trechos:
+            corpus = st.session_state.get('corpus')
+            trechos = corpus.buscar(input_usuario, TOP_K_TRECHOS) if corpus is not None else []
+            # Linhas de bancos do Notion filtradas pela pergunta (em número limitado)
+            # entram logo depois do trecho mais relevante da busca, que assim
+            # nunca é cortado pelo orçamento de tokens
+            trechos = trechos[:1] + consulta_notion_pergunta(input_usuario) + trechos[1:] + complementares
+
+        orcamento = st.session_state.get('orcamento')
+        pergunta = input_usuario
+        if orcamento is not None:
+            trechos, historico, pergunta, uso = orcamento.ajustar(SYSTEM_MESSAGE, trechos, historico, input_usuario)
+            st.session_state['uso_tokens'] = uso
+
         chat = st.chat_message('ai')
         resposta = chat.write_stream(chain.stream({
-            'input': input_usuario,
-            'chat_history': memoria.buffer_as_messages
+            'input': pergunta,
+            'chat_history': historico,
+            'contexto': formata_contexto(trechos)
             }))
         #resposta = chat_model.invoke(input_usuario).content
-        memoria.chat_memory.add_ai_message(resposta)
-        st.session_state['memoria'] = memoria
+        memoria.adicionar_ia(resposta)
+        if memoria.precisa_resumir():
+            try:
+                with st.spinner('Atualizando o resumo da conversa...'):
+                    memoria.resumir(lambda prompt: chain.last.invoke(prompt).content)
+            except Exception as e:
+                # A resposta já foi exibida; o resumo fica para o próximo turno
+                st.warning(f'Não foi possível atualizar o resumo da conversa: {str(e)}')
+
+        uso = st.session_state.get('uso_tokens')
+        if uso:
+            st.caption(
+                f"Prompt: {uso['total']} de {uso['limite']} tokens "
+                f"(contexto {uso['contexto']}, histórico {uso['historico']}, pergunta {uso['pergunta']}; "
+                f"{uso['trechos_enviados']} trechos, {uso['mensagens_descartadas']} mensagens antigas omitidas)"
+            )
         #st._rerun()
         
 def sidebar():
@@ -303,6 +509,15 @@ def sidebar():
         )
         st.session_state[f'api_key_{provedor}'] = api_key
 
+        st.radio(
+            'Memória da conversa',
+            MODOS_MEMORIA,
+            index=MODOS_MEMORIA.index(MODO_PADRAO) if MODO_PADRAO in MODOS_MEMORIA else 0,
+            key='modo_memoria',
+            format_func=lambda modo: {'janela': 'Mensagens recentes', 'resumo': 'Recentes + resumo das anteriores'}[modo],
+            horizontal=True
+        )
+
         # Adiciona a mensagem condicional
         if api_key:
             st.info('API adicionada! Agora vá para o menu "RAG de dados" para iniciar o assistente.')
@@ -369,8 +584,20 @@ def sidebar():
         if st.button('▶️ Iniciar o Assistente', use_container_width=True):
             carrega_modelo(provedor, modelo, api_key, tipo_arquivo, arquivo)
 
+        corpus = st.session_state.get('corpus')
+        if corpus:
+            st.markdown(f"**Fontes carregadas** ({corpus.total_trechos()} trechos)")
+            for identificador, fonte in list(corpus.fontes.items()):
+                col1, col2 = st.columns([5, 1])
+                col1.caption(f"{fonte['tipo']}: {fonte['nome']} ({len(fonte['indice'])} trechos)")
+                if col2.button('✖️', key=f'remover_{identificador}', help='Remover esta fonte'):
+                    corpus.remover(identificador)
+                    if fonte['tipo'] == 'Notion':
+                        esquecer_banco_notion(fonte['nome'].removeprefix('Notion '))
+                    st.rerun()
+
         if st.button('🗑️ Limpar o histórico de conversação', use_container_width=True):
-            st.session_state['memoria'] = MEMORIA
+            st.session_state['memoria'] = MemoriaSessao(st.session_state.get('modo_memoria', MODO_PADRAO))
 
 
     with tabs_assistente[2]:
@@ -422,6 +649,7 @@ def sidebar():
             conn.close()
             
             if len(df_mini) > 0:
+                import plotly.express as px
                 df_mini['data'] = pd.to_datetime(df_mini['data'])
                 fig_mini = px.bar(df_mini, x='data', y='acessos', 
                                 height=200, 
@@ -0,0 +1,59 @@
+"""
+Mede a vazão do motor de transcrição (segundos de áudio por segundo de relógio)
+para cada backend, sobre áudio sintético: rajadas de ruído (fala) separadas por
+pausas curtas, em PCM mono 16 bits.
+
+Uso:
+    python bench_transcricao.py [minutos] [backend ...]
+
+Sem backends, mede apenas o 'falso' (offline), sem atraso e com um atraso
+simulado de serviço remoto. Backends reais ('google', 'sphinx', ...) precisam
+das respectivas dependências e, quando for o caso, de acesso à rede.
+"""
+import sys
+import time
+
+import numpy as np
+
+from transcricao import BackendFalso, obter_backend, transcrever_pcm
+
+
+TAXA = 16000
+LARGURA = 2
+
+
+def audio_sintetico(minutos, taxa=TAXA, semente=0):
+    """PCM mono 16 bits com falas de 2 a 12 s separadas por pausas de 0,5 s."""
+    rng = np.random.default_rng(semente)
+    total = int(minutos * 60 * taxa)
+    partes, tamanho = [], 0
+    while tamanho < total:
+        fala = rng.normal(0, 3000, int(taxa * rng.uniform(2, 12)))
+        pausa = rng.normal(0, 30, int(taxa * 0.5))
+        partes += [fala, pausa]
+        tamanho += len(fala) + len(pausa)
+    return np.clip(np.concatenate(partes)[:total], -32768, 32767).astype(np.int16).tobytes()
+
+
+def medir(backend, pcm, taxa=TAXA, largura=LARGURA):
+    inicio = time.perf_counter()
+    segmentos = transcrever_pcm(pcm, taxa, largura, backend=backend)
+    duracao = time.perf_counter() - inicio
+    segundos_audio = len(pcm) / (taxa * largura)
+    return {'segmentos': len(segmentos), 'segundos': duracao, 'vazao': segundos_audio / duracao}
+
+
+if __name__ == '__main__':
+    minutos = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    nomes = sys.argv[2:]
+    backends = [obter_backend(nome) for nome in nomes] or [BackendFalso(), BackendFalso(atraso_por_segundo=0.01)]
+
+    pcm = audio_sintetico(minutos)
+    print(f'Áudio sintético: {minutos:g} min')
+    for backend in backends:
+        rotulo = backend.nome
+        if getattr(backend, 'atraso_por_segundo', 0):
+            rotulo += f' (atraso {backend.atraso_por_segundo:g} s/s)'
+        resultado = medir(backend, pcm)
+        print(f"{rotulo:<28} {resultado['segmentos']:>4} trechos  {resultado['segundos']:8.3f}s  "
+              f"{resultado['vazao']:10.1f}x tempo real")
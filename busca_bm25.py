@@ -0,0 +1,212 @@
+"""
+Busca lexical BM25 para textos jurídicos em português, sem dependência de rede.
+
+A tokenização remove acentos, descarta stopwords e aplica o stemmer Snowball
+do nltk. O índice guarda as listas de postagens em arrays NumPy contíguos
+(formato CSR: um ponteiro por termo apontando para os documentos e frequências),
+o que mantém as consultas na casa dos milissegundos mesmo com centenas de
+milhares de trechos.
+"""
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+
+K1 = 1.5
+B = 0.75
+
+_PADRAO_PALAVRA = re.compile(r'\w+')
+
+# Usada quando o corpus de stopwords do nltk não foi baixado (ambiente sem rede)
+STOPWORDS_PADRAO = '''
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles
+depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes
+eu foi foram ha isso isto ja lhe lhes mais mas me mesmo meu meus minha minhas muito na nao nas
+nem no nos nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual quando
+que quem se sem ser seu seus so sua suas tambem te tem teu tua tuas um uma umas uns voce voces
+vos sao sera estao esta estava estavam tinha tinham ter seja sejam pois porque onde
+'''.split()
+
+
+def remove_acentos(texto):
+    """Remove acentos e cedilhas mantendo as letras base."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=None)
+def stopwords():
+    """Stopwords sem acento; o nltk só é importado na primeira tokenização."""
+    try:
+        from nltk.corpus import stopwords as corpus_stopwords
+        palavras = corpus_stopwords.words('portuguese')
+    except (ImportError, LookupError):
+        palavras = STOPWORDS_PADRAO
+    return frozenset(remove_acentos(p.lower()) for p in palavras)
+
+
+@lru_cache(maxsize=None)
+def _stemmer():
+    try:
+        from nltk.stem.snowball import SnowballStemmer
+        return SnowballStemmer('portuguese').stem
+    except ImportError:
+        # Radicalização mínima: apenas plurais
+        return lambda palavra: palavra[:-1] if len(palavra) > 3 and palavra.endswith('s') else palavra
+
+
+@lru_cache(maxsize=200_000)
+def _normaliza_palavra(palavra):
+    """Termo normalizado de uma palavra, ou '' se ela deve ser descartada."""
+    if len(palavra) < 2 and not palavra.isdigit():
+        return ''
+    if remove_acentos(palavra) in stopwords():
+        return ''
+    # O Snowball espera o texto acentuado; os acentos são removidos depois
+    return remove_acentos(_stemmer()(palavra))
+
+
+def tokenizar(texto):
+    """Converte um texto em lista de termos normalizados (sem acento, sem stopwords, radicalizados)."""
+    return [termo for termo in map(_normaliza_palavra, _PADRAO_PALAVRA.findall(texto.lower())) if termo]
+
+
+class IndiceBM25:
+    """
+    Índice BM25 imutável sobre uma sequência de trechos ({'texto': ..., 'fonte': ...}).
+
+    As postagens de cada termo ficam em fatias contíguas de `documentos` e
+    `frequencias`, delimitadas por `ponteiros[id_termo]:ponteiros[id_termo + 1]`.
+    """
+
+    def __init__(self, trechos, k1=K1, b=B):
+        self.trechos = []
+        self.k1 = k1
+        self.b = b
+        self.vocabulario = {}
+
+        termos_ids = array('i')
+        documentos = array('i')
+        frequencias = array('f')
+        comprimentos = array('f')
+
+        # `trechos` pode ser um gerador: cada trecho é tokenizado assim que chega
+        for posicao, trecho in enumerate(trechos):
+            self.trechos.append(trecho)
+            termos = tokenizar(trecho['texto'])
+            comprimentos.append(len(termos))
+            contagem = Counter(termos)
+            termos_ids.extend(self.vocabulario.setdefault(termo, len(self.vocabulario)) for termo in contagem)
+            documentos.extend([posicao] * len(contagem))
+            frequencias.extend(contagem.values())
+
+        termos_ids = np.frombuffer(termos_ids, dtype=np.int32)
+        # Ordenação estável: dentro de cada termo os documentos continuam em ordem crescente
+        ordem = np.argsort(termos_ids, kind='stable')
+        self.documentos = np.frombuffer(documentos, dtype=np.int32)[ordem]
+        self.frequencias = np.frombuffer(frequencias, dtype=np.float32)[ordem]
+        self.df = np.bincount(termos_ids, minlength=len(self.vocabulario)).astype(np.int32)
+        self.ponteiros = np.zeros(len(self.vocabulario) + 1, dtype=np.int64)
+        np.cumsum(self.df, out=self.ponteiros[1:])
+        self.comprimentos = comprimentos = np.frombuffer(comprimentos, dtype=np.float32)
+        self.media_comprimento = float(comprimentos.mean()) if len(comprimentos) else 0.0
+        self.normalizacao = self.k1 * (1 - self.b + self.b * comprimentos / max(self.media_comprimento, 1.0))
+        self._normalizacao_externa = (None, None)
+
+    def __len__(self):
+        return len(self.trechos)
+
+    def idf(self, df, total=None):
+        total = len(self.trechos) if total is None else total
+        return np.log1p((total - df + 0.5) / (df + 0.5))
+
+    def frequencia_documental(self, termo):
+        """Em quantos trechos deste índice o termo aparece."""
+        id_termo = self.vocabulario.get(termo)
+        return 0 if id_termo is None else int(self.df[id_termo])
+
+    def _normalizacao_para(self, media_comprimento):
+        if media_comprimento == self.media_comprimento:
+            return self.normalizacao
+        # O índice é compartilhado entre sessões: lê a tupla uma vez só, para
+        # não misturar a média de uma sessão com a normalização de outra
+        media_salva, normalizacao = self._normalizacao_externa
+        if media_salva != media_comprimento:
+            normalizacao = self.k1 * (1 - self.b + self.b * self.comprimentos / max(media_comprimento, 1.0))
+            self._normalizacao_externa = (media_comprimento, normalizacao)
+        return normalizacao
+
+    def pontuar(self, consulta, estatisticas=None):
+        """
+        Retorna o vetor de pontuações BM25 de todos os trechos para a consulta.
+
+        `consulta` pode ser um texto ou um Counter de termos já tokenizados.
+        `estatisticas` permite pontuar com números globais de vários índices:
+        (total de trechos, {termo: frequência documental}, comprimento médio).
+        """
+        pontuacao = np.zeros(len(self.trechos), dtype=np.float32)
+        if not len(self.trechos):
+            return pontuacao
+        termos = consulta if isinstance(consulta, Counter) else Counter(tokenizar(consulta))
+        if estatisticas is None:
+            total, df_global, normalizacao = len(self.trechos), None, self.normalizacao
+        else:
+            total, df_global, media = estatisticas
+            normalizacao = self._normalizacao_para(media)
+        for termo, peso_consulta in termos.items():
+            id_termo = self.vocabulario.get(termo)
+            if id_termo is None:
+                continue
+            inicio, fim = self.ponteiros[id_termo], self.ponteiros[id_termo + 1]
+            docs = self.documentos[inicio:fim]
+            tf = self.frequencias[inicio:fim]
+            df = self.df[id_termo] if df_global is None else df_global[termo]
+            idf = self.idf(df, total)
+            pontuacao[docs] += peso_consulta * idf * tf * (self.k1 + 1) / (tf + normalizacao[docs])
+        return pontuacao
+
+    def buscar(self, consulta, k=6):
+        """Retorna os k trechos mais relevantes, do mais para o menos relevante."""
+        pontuacao = self.pontuar(consulta)
+        return [self.trechos[posicao] for posicao in melhores_posicoes(pontuacao, k)]
+
+
+def buscar_em_indices(indices, consulta, k=6):
+    """
+    Busca em vários índices como se fossem um só: as pontuações usam o total
+    de trechos, as frequências documentais e o comprimento médio combinados,
+    sem precisar reconstruir nenhum dos índices.
+    """
+    indices = [indice for indice in indices if len(indice)]
+    if not indices or k <= 0:
+        return []
+    termos = Counter(tokenizar(consulta))
+    total = sum(len(indice) for indice in indices)
+    media = float(sum(indice.comprimentos.sum() for indice in indices)) / total
+    df_global = {termo: sum(indice.frequencia_documental(termo) for indice in indices) for termo in termos}
+    estatisticas = (total, df_global, media)
+
+    candidatos = []
+    for ordem, indice in enumerate(indices):
+        pontuacao = indice.pontuar(termos, estatisticas)
+        for posicao in melhores_posicoes(pontuacao, k):
+            candidatos.append((-float(pontuacao[posicao]), ordem, posicao))
+    candidatos.sort()
+    return [indices[ordem].trechos[posicao] for _, ordem, posicao in candidatos[:k]]
+
+
+def melhores_posicoes(pontuacao, k):
+    """Posições das k maiores pontuações positivas, com desempate determinístico pela posição."""
+    if k <= 0:
+        return []
+    candidatos = np.flatnonzero(pontuacao > 0)
+    if len(candidatos) > k:
+        corte = np.argpartition(-pontuacao[candidatos], k - 1)[:k]
+        limite = pontuacao[candidatos[corte]].min()
+        candidatos = candidatos[pontuacao[candidatos] >= limite]
+    ordem = np.lexsort((candidatos, -pontuacao[candidatos]))
+    return candidatos[ordem][:k].tolist()
@@ -0,0 +1,155 @@
+"""
+Cache em disco do texto extraído de arquivos carregados.
+
+A chave é o hash SHA-256 do conteúdo do arquivo combinado com o tipo e a versão
+dos loaders, de modo que o mesmo PDF enviado por qualquer analista, em qualquer
+sessão ou worker do Streamlit, é extraído uma única vez. O texto é gravado
+comprimido com zlib, com as páginas separadas por form feed, e pode ser
+gravado e lido em streaming, página por página. A gravação é atômica
+(arquivo temporário + os.replace) e, quando o diretório passa do limite de
+tamanho, os itens usados há mais tempo são removidos (LRU pela data de
+modificação, atualizada a cada leitura).
+"""
+import codecs
+import hashlib
+import os
+import tempfile
+import zlib
+
+from loaders import VERSAO_LOADERS
+
+
+DIRETORIO_CACHE = os.path.join(os.getenv('JURIA_CACHE_DIR', '.cache'), 'extracao')
+LIMITE_BYTES = int(os.getenv('JURIA_CACHE_EXTRACAO_MB', '512')) * 1024 * 1024
+EXTENSAO = '.txt.z'
+SEPARADOR_PAGINAS = '\f'
+TAMANHO_BLOCO = 64 * 1024
+
+
+class ItemCorrompido(Exception):
+    """Item do cache ilegível (corrompido ou removido por outro worker) durante a leitura em streaming."""
+
+
+def chave_extracao(hash_conteudo, tipo_arquivo):
+    """Chave do cache a partir do hash hexadecimal do conteúdo, do tipo de arquivo e da versão dos loaders."""
+    base = f'{hash_conteudo}|{tipo_arquivo}|{VERSAO_LOADERS}'
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _caminho(chave):
+    return os.path.join(DIRETORIO_CACHE, chave + EXTENSAO)
+
+
+def abrir_paginas(chave, numerar=True):
+    """
+    Leitor em streaming de um item do cache, página por página.
+
+    Retorna None se a chave não estiver no cache; caso contrário, um gerador de
+    pares (número da página, texto) — número None quando `numerar` é falso —
+    que descomprime o arquivo em blocos, sem carregar o documento inteiro.
+    Se o item se mostrar ilegível no meio da leitura, ele é removido do cache
+    e o gerador levanta ItemCorrompido.
+    """
+    caminho = _caminho(chave)
+    if not _marca_uso(caminho):
+        return None
+    return _itera_paginas(caminho, numerar)
+
+
+def _itera_paginas(caminho, numerar):
+    try:
+        yield from _descomprime_paginas(caminho, numerar)
+    except (OSError, zlib.error, UnicodeDecodeError) as e:
+        _remove(caminho)
+        raise ItemCorrompido(f'{os.path.basename(caminho)}: {e}') from e
+
+
+def _descomprime_paginas(caminho, numerar):
+    descompressor = zlib.decompressobj()
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    fragmentos = []  # pedaços da página corrente ainda sem separador
+    numero = 1
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            partes = decodificador.decode(descompressor.decompress(bloco)).split(SEPARADOR_PAGINAS)
+            fragmentos.append(partes[0])
+            for parte in partes[1:]:
+                yield (numero if numerar else None), ''.join(fragmentos)
+                numero += 1
+                fragmentos = [parte]
+    fragmentos.append(decodificador.decode(descompressor.flush(), final=True))
+    if not descompressor.eof:
+        raise zlib.error('fluxo comprimido incompleto')
+    yield (numero if numerar else None), ''.join(fragmentos)
+
+
+def _marca_uso(caminho):
+    try:
+        os.utime(caminho)  # marca como usado recentemente
+        return True
+    except OSError:
+        return False
+
+
+def guardar_paginas(chave, paginas, limitar=True):
+    """
+    Grava no cache um iterável de textos de página, comprimindo à medida que
+    chegam, e aplica o limite de tamanho (a menos que `limitar` seja falso, como
+    nos workers de extração: o limite é aplicado uma vez pelo processo
+    principal, ao fim do lote). Retorna o número de páginas gravadas.
+    """
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    compressor = zlib.compressobj(6)
+    descritor, temporario = tempfile.mkstemp(dir=DIRETORIO_CACHE, suffix='.tmp')
+    total = 0
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            for texto in paginas:
+                if total:
+                    f.write(compressor.compress(SEPARADOR_PAGINAS.encode('utf-8')))
+                f.write(compressor.compress(texto.replace(SEPARADOR_PAGINAS, ' ').encode('utf-8')))
+                total += 1
+            f.write(compressor.flush())
+        os.replace(temporario, _caminho(chave))
+    except BaseException:
+        _remove(temporario)
+        raise
+    if limitar:
+        aplicar_limite([chave])
+    return total
+
+
+def _remove(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def aplicar_limite(chaves_preservadas=(), limite=None):
+    """Remove os itens usados há mais tempo até o cache caber no limite, sem tocar nas chaves preservadas."""
+    limite = LIMITE_BYTES if limite is None else limite
+    preservar = {_caminho(chave) for chave in chaves_preservadas}
+    itens = []
+    total = 0
+    try:
+        entradas = list(os.scandir(DIRETORIO_CACHE))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        if not entrada.name.endswith(EXTENSAO):
+            continue
+        try:
+            info = entrada.stat()
+        except FileNotFoundError:
+            continue  # removido por outro worker
+        total += info.st_size
+        if entrada.path not in preservar:
+            itens.append((info.st_mtime, entrada.path, info.st_size))
+    if total <= limite:
+        return
+    for _, caminho, tamanho in sorted(itens):
+        _remove(caminho)
+        total -= tamanho
+        if total <= limite:
+            break
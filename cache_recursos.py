@@ -0,0 +1,84 @@
+"""
+Cache de recursos caros de construir, compartilhado por todas as sessões do processo.
+
+Guarda clientes de chat (com seus pools de conexão HTTP/TLS já abertos), chains
+montadas e índices de documentos. Itens sem uso por mais de `tempo_ocioso`
+segundos são descartados, assim como os menos usados quando o cache passa de
+`max_itens`. As chaves nunca contêm a API key em claro, apenas a sua impressão
+digital (hash).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+TEMPO_OCIOSO = int(os.getenv('JURIA_RECURSOS_TEMPO_OCIOSO', '1800'))
+MAX_ITENS = int(os.getenv('JURIA_RECURSOS_MAX_ITENS', '64'))
+
+
+def impressao_digital(api_key):
+    """Identificador curto e não reversível de uma API key."""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+def hash_documentos(documentos):
+    """Hash do conteúdo de uma lista de documentos em texto."""
+    h = hashlib.sha256()
+    for documento in documentos:
+        dados = (documento or '').encode('utf-8')
+        h.update(len(dados).to_bytes(8, 'little'))
+        h.update(dados)
+    return h.hexdigest()
+
+
+class CacheRecursos:
+    """Cache LRU com expiração por ociosidade, seguro para uso entre threads."""
+
+    def __init__(self, tempo_ocioso=TEMPO_OCIOSO, max_itens=MAX_ITENS):
+        self.tempo_ocioso = tempo_ocioso
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # chave -> (valor, último uso)
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _expira(self, agora):
+        while self._itens:
+            chave, (_, ultimo_uso) = next(iter(self._itens.items()))
+            if agora - ultimo_uso <= self.tempo_ocioso:
+                break
+            del self._itens[chave]
+
+    def obter(self, chave, construir):
+        """Retorna o recurso da chave, construindo-o com `construir()` apenas se ainda não existir."""
+        agora = time.monotonic()
+        with self._trava:
+            self._expira(agora)
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens[chave] = (item[0], agora)
+                self._itens.move_to_end(chave)
+                return item[0]
+
+        # A construção fica fora da trava para não bloquear outras sessões;
+        # se duas sessões construírem ao mesmo tempo, prevalece a primeira gravada
+        valor = construir()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None:
+                valor = item[0]
+            self._itens[chave] = (valor, time.monotonic())
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+
+RECURSOS = CacheRecursos()
@@ -0,0 +1,77 @@
+"""
+Cache local de transcrições do YouTube, pelo id do vídeo.
+
+Guarda a transcrição (segmentos com tempos), o título, a duração e a origem
+('legendas' ou 'asr') em um arquivo JSON por vídeo, em
+JURIA_CACHE_DIR/youtube. Vídeos já carregados voltam em milissegundos, sem
+acessar o YouTube. A gravação é atômica (arquivo temporário + os.replace).
+"""
+import json
+import os
+import re
+import tempfile
+
+
+DIRETORIO_CACHE = os.path.join(os.getenv('JURIA_CACHE_DIR', '.cache'), 'youtube')
+VERSAO_CACHE = 1
+
+_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+
+def _caminho(id_video):
+    if not _ID_VALIDO.match(id_video or ''):
+        return None
+    return os.path.join(DIRETORIO_CACHE, f'{id_video}.json')
+
+
+def obter(id_video):
+    """Dados salvos do vídeo ({'titulo', 'duracao', 'origem', 'segmentos'}) ou None."""
+    caminho = _caminho(id_video)
+    if caminho is None:
+        return None
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # Item corrompido: descarta e deixa o vídeo ser carregado de novo
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        return None
+    return dados if dados.get('versao') == VERSAO_CACHE else None
+
+
+def dados_video(id_video, segmentos, origem, titulo=None, duracao=None):
+    """Dados do vídeo no formato do cache (o mesmo devolvido por `obter`)."""
+    return {
+        'versao': VERSAO_CACHE,
+        'titulo': titulo or id_video,
+        'duracao': duracao if duracao is not None else (segmentos[-1]['fim'] if segmentos else 0),
+        'origem': origem,
+        'segmentos': segmentos,
+    }
+
+
+def guardar(id_video, dados):
+    """
+    Grava os dados do vídeo (ver dados_video). O cache é só um atalho: ids
+    inválidos e falhas de gravação são ignorados. Retorna se gravou.
+    """
+    caminho = _caminho(id_video)
+    if caminho is None:
+        return False
+    temporario = None
+    try:
+        os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=DIRETORIO_CACHE, suffix='.tmp')
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        return True
+    except OSError:
+        if temporario and os.path.exists(temporario):
+            os.remove(temporario)
+        return False
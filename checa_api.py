@@ -1,19 +1,26 @@
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from notion_client import Client
+
+from notion_limites import LIMITADOR, ClienteNotion
 
 load_dotenv()
 
 
-def check_notion_api_limits(notion_client, database_id):
+def check_notion_api_limits(notion_client, database_id, requisicoes=1):
     try:
-        # Faça uma requisição e capture os cabeçalhos
-        response = notion_client.databases.query(
-            database_id=database_id,
-            page_size=1  # Requisição mínima
-        )
+        # Requisições mínimas, todas pela camada de controle de taxa
+        # (notion_limites): 429s são esperados e repetidos, não viram erro
+        inicio = time.perf_counter()
+        for _ in range(requisicoes):
+            notion_client.databases.query(
+                database_id=database_id,
+                page_size=1  # Requisição mínima
+            )
+        duracao = time.perf_counter() - inicio
 
-        # Se a biblioteca não expõe diretamente, você pode precisar 
+        # Se a biblioteca não expõe diretamente, você pode precisar
         # usar requests diretamente
         import requests
 
@@ -33,16 +40,31 @@ def check_notion_api_limits(notion_client, database_id):
         print(f"Requisições Restantes: {response.headers.get('X-RateLimit-Remaining')}")
         print(f"Tempo até Reset: {response.headers.get('X-RateLimit-Reset')}")
 
+        # Métricas da camada de controle de taxa
+        metricas = LIMITADOR.resumo()
+        print("\nControle de taxa:")
+        print(f"Requisições: {metricas['requisicoes']} em {duracao:.2f}s ({requisicoes / duracao:.2f} req/s)")
+        print(f"Respostas 429: {metricas['limitadas']}")
+        print(f"Novas tentativas: {metricas['novas_tentativas']} (outros erros temporários: {metricas['erros']})")
+        print(f"Tempo total de espera: {metricas['espera_total']:.2f}s")
+        print(f"Taxa atual: {metricas['taxa_atual']:.2f} req/s")
+        return True
+
     except Exception as e:
         print(f"Erro ao verificar limites: {e}")
         return False
 
 if __name__ == '__main__':
     # Inicialize o cliente Notion
-    notion = Client(auth=os.getenv('NOTION_API_KEY'))
+    notion = ClienteNotion(auth=os.getenv('NOTION_API_KEY'))
 
     # ID do banco de dados Notion
     database_id = os.getenv('NOTION_PAGE_ID')
 
+    # Número de requisições para medir a taxa sustentada (padrão: 1)
+    requisicoes = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    if requisicoes < 1:
+        sys.exit('O número de requisições deve ser pelo menos 1')
+
     # Verifique os limites da API
-    check_notion_api_limits(notion, database_id)
\ No newline at end of file
+    check_notion_api_limits(notion, database_id, requisicoes)
@@ -0,0 +1,68 @@
+"""
+Verifica o custo de importação a frio do app (assistenteCaojuri.py).
+
+Executa, em um processo Python novo, apenas as importações de nível de módulo
+do app (sem rodar a interface) e confere:
+  - se o tempo total ficou dentro do orçamento;
+  - se nenhuma dependência pesada de loaders ou provedores foi carregada antes
+    de o usuário selecionar o tipo de fonte ou o provedor correspondente.
+
+Uso:
+    python checa_importacao.py [orçamento_em_segundos]
+"""
+import ast
+import json
+import os
+import subprocess
+import sys
+
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_APP = os.path.join(DIRETORIO, 'assistenteCaojuri.py')
+ORCAMENTO_SEGUNDOS = float(os.getenv('JURIA_ORCAMENTO_IMPORTACAO', '3.0'))
+
+MODULOS_PESADOS = [
+    'moviepy', 'pydub', 'speech_recognition', 'pytube', 'youtube_transcript_api', 'gdown', 'notion_client',
+    'pypdf',
+    'langchain_community', 'langchain_openai', 'langchain_anthropic', 'langchain_google_genai',
+    'plotly', 'nltk',
+]
+
+
+def importacoes_do_app(caminho=ARQUIVO_APP):
+    """Código-fonte das instruções import de nível de módulo do app."""
+    with open(caminho, encoding='utf-8') as f:
+        arvore = ast.parse(f.read())
+    return [ast.unparse(no) for no in arvore.body if isinstance(no, (ast.Import, ast.ImportFrom))]
+
+
+def medir_importacao(importacoes):
+    codigo = '\n'.join([
+        'import json, sys, time',
+        'inicio = time.perf_counter()',
+        *importacoes,
+        'duracao = time.perf_counter() - inicio',
+        'print(json.dumps({"segundos": duracao, "modulos": sorted(sys.modules)}))',
+    ])
+    saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True,
+                           cwd=DIRETORIO)
+    if saida.returncode != 0:
+        raise RuntimeError(f'Falha ao importar o app:\n{saida.stderr}')
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def checa_importacao(orcamento=ORCAMENTO_SEGUNDOS):
+    resultado = medir_importacao(importacoes_do_app())
+    carregados = {nome.split('.')[0] for nome in resultado['modulos']}
+    pesados = [nome for nome in MODULOS_PESADOS if nome in carregados]
+
+    print(f"Tempo de importação do app: {resultado['segundos']:.3f}s (orçamento: {orcamento:.3f}s)")
+    if pesados:
+        print(f"Dependências pesadas carregadas na importação: {', '.join(pesados)}")
+
+    return resultado['segundos'] <= orcamento and not pesados
+
+
+if __name__ == '__main__':
+    orcamento = float(sys.argv[1]) if len(sys.argv) > 1 else ORCAMENTO_SEGUNDOS
+    sys.exit(0 if checa_importacao(orcamento) else 1)
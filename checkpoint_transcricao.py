@@ -0,0 +1,131 @@
+"""
+Checkpoints de transcrição em SQLite.
+
+Cada trabalho é identificado pelo hash do conteúdo da mídia e pelos parâmetros
+que mudam o resultado (backend, idioma, segmentação). Cada trecho reconhecido é
+gravado assim que termina; se a transcrição falhar no meio ou a sessão do
+Streamlit for reiniciada, a próxima execução só processa os trechos que faltam.
+Transcrições concluídas são servidas direto do banco, sem decodificar o áudio.
+
+Trechos que falharam por erro de API não são gravados, para serem tentados de
+novo na próxima execução.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from segmentacao_audio import DURACAO_MAXIMA, DURACAO_MINIMA, QUADRO_MS
+
+
+CAMINHO_BANCO = os.path.join(os.getenv('JURIA_CACHE_DIR', '.cache'), 'transcricoes.db')
+# Mudou com a extração do áudio em PCM 16 kHz: checkpoints antigos não se misturam aos novos
+VERSAO_TRANSCRICAO = '2'
+
+_trava = threading.Lock()
+
+
+def chave_transcricao(hash_midia, backend, idioma):
+    """Chave do trabalho: conteúdo da mídia + tudo que altera os trechos ou o texto."""
+    base = '|'.join(str(parte) for parte in (
+        hash_midia, backend, idioma, DURACAO_MINIMA, DURACAO_MAXIMA, QUADRO_MS, VERSAO_TRANSCRICAO,
+    ))
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _conectar(caminho=CAMINHO_BANCO):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trabalhos (
+            chave TEXT PRIMARY KEY,
+            total_trechos INTEGER NOT NULL,
+            concluido INTEGER NOT NULL DEFAULT 0,
+            atualizado_em REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trechos (
+            chave TEXT NOT NULL,
+            indice INTEGER NOT NULL,
+            inicio REAL NOT NULL,
+            fim REAL NOT NULL,
+            texto TEXT NOT NULL,
+            PRIMARY KEY (chave, indice)
+        )
+    ''')
+    return conn
+
+
+class CheckpointTranscricao:
+    """Progresso persistente de um trabalho de transcrição."""
+
+    def __init__(self, chave, caminho=CAMINHO_BANCO):
+        self.chave = chave
+        self.caminho = caminho
+
+    def concluida(self):
+        """Segmentos {'inicio', 'fim', 'texto'} da transcrição concluída, ou None."""
+        with _trava:
+            conn = _conectar(self.caminho)
+            try:
+                linha = conn.execute('SELECT concluido FROM trabalhos WHERE chave = ?', (self.chave,)).fetchone()
+                if not linha or not linha[0]:
+                    return None
+                return list(self._segmentos(conn).values())
+            finally:
+                conn.close()
+
+    def iniciar(self, total_trechos):
+        """
+        Registra o trabalho e retorna {índice: segmento} dos trechos já salvos.
+        Se a segmentação mudou (outro número de trechos), o progresso antigo é descartado.
+        """
+        with _trava:
+            conn = _conectar(self.caminho)
+            try:
+                with conn:
+                    linha = conn.execute('SELECT total_trechos FROM trabalhos WHERE chave = ?',
+                                         (self.chave,)).fetchone()
+                    if linha and linha[0] != total_trechos:
+                        conn.execute('DELETE FROM trechos WHERE chave = ?', (self.chave,))
+                    conn.execute('''
+                        INSERT INTO trabalhos (chave, total_trechos, concluido, atualizado_em) VALUES (?, ?, 0, ?)
+                        ON CONFLICT(chave) DO UPDATE SET total_trechos = excluded.total_trechos,
+                                                         atualizado_em = excluded.atualizado_em
+                    ''', (self.chave, total_trechos, time.time()))
+                return self._segmentos(conn)
+            finally:
+                conn.close()
+
+    def salvar_trecho(self, indice, segmento):
+        with _trava:
+            conn = _conectar(self.caminho)
+            try:
+                with conn:
+                    conn.execute('INSERT OR REPLACE INTO trechos (chave, indice, inicio, fim, texto) VALUES (?, ?, ?, ?, ?)',
+                                 (self.chave, indice, segmento['inicio'], segmento['fim'], segmento['texto']))
+            finally:
+                conn.close()
+
+    def concluir(self):
+        """Marca o trabalho como concluído se todos os trechos estiverem salvos."""
+        with _trava:
+            conn = _conectar(self.caminho)
+            try:
+                with conn:
+                    conn.execute('''
+                        UPDATE trabalhos SET concluido = 1, atualizado_em = ?
+                        WHERE chave = ? AND total_trechos = (SELECT COUNT(*) FROM trechos WHERE chave = ?)
+                    ''', (time.time(), self.chave, self.chave))
+            finally:
+                conn.close()
+
+    def _segmentos(self, conn):
+        """{índice: segmento} dos trechos salvos, em ordem."""
+        linhas = conn.execute('SELECT indice, inicio, fim, texto FROM trechos WHERE chave = ? ORDER BY indice',
+                              (self.chave,))
+        return {indice: {'inicio': inicio, 'fim': fim, 'texto': texto}
+                for indice, inicio, fim, texto in linhas}
@@ -0,0 +1,60 @@
+"""
+Corpus de fontes de uma sessão.
+
+Cada fonte (PDF, site, YouTube, CSV, TXT, MP4, Notion, Google Drive) tem seus
+próprios trechos e seu próprio índice BM25. Adicionar ou remover uma fonte só
+extrai e indexa aquela fonte; a busca combina todos os índices existentes.
+"""
+from collections import OrderedDict
+
+from busca_bm25 import buscar_em_indices
+from cache_recursos import RECURSOS, hash_documentos
+from recuperacao import cria_indice, TOP_K_TRECHOS
+
+
+def id_fonte(tipo_arquivo, nome):
+    return f'{tipo_arquivo}:{nome}'
+
+
+def documento_de_texto(nome, texto):
+    """Representa um texto já extraído como documento (nome, hash, páginas) aceito pelo corpus."""
+    return nome, hash_documentos([texto]), [(None, texto)]
+
+
+class Corpus:
+    """Fontes carregadas em uma sessão, indexadas individualmente."""
+
+    def __init__(self):
+        self.fontes = OrderedDict()  # id -> {'tipo', 'nome', 'hash', 'indice'}
+
+    def __len__(self):
+        return len(self.fontes)
+
+    def adicionar(self, tipo_arquivo, nome, hash_conteudo, paginas, parcial=False):
+        """
+        Inclui (ou atualiza) uma fonte a partir de pares (número da página, texto).
+        Se o conteúdo não mudou, nada é refeito e `paginas` nem é lido.
+        Fontes `parcial` (ainda crescendo, como uma transcrição em andamento) são
+        indexadas sem passar pelo cache compartilhado de índices.
+        Retorna o id da fonte.
+        """
+        identificador = id_fonte(tipo_arquivo, nome)
+        fonte = self.fontes.get(identificador)
+        if fonte is not None and fonte['hash'] == hash_conteudo:
+            return identificador
+        if parcial:
+            indice = cria_indice(paginas, fonte=nome)
+        else:
+            indice = RECURSOS.obter(('indice', hash_conteudo, nome), lambda: cria_indice(paginas, fonte=nome))
+        self.fontes[identificador] = {'tipo': tipo_arquivo, 'nome': nome, 'hash': hash_conteudo, 'indice': indice}
+        return identificador
+
+    def remover(self, identificador):
+        self.fontes.pop(identificador, None)
+
+    def total_trechos(self):
+        return sum(len(fonte['indice']) for fonte in self.fontes.values())
+
+    def buscar(self, consulta, k=TOP_K_TRECHOS):
+        """Trechos mais relevantes de todas as fontes do corpus."""
+        return buscar_em_indices([fonte['indice'] for fonte in self.fontes.values()], consulta, k)
@@ -0,0 +1,114 @@
+"""
+Extração paralela de vários arquivos (PDF, CSV, TXT) em um pool de processos.
+
+O pool é limitado e reaproveitado entre execuções, para que os workers já
+tenham os loaders importados. Cada worker grava o texto extraído no cache de
+extração, que serve de passagem para o processo principal: nenhum texto
+grande trafega entre processos. Os resultados voltam na ordem original e a
+falha de um arquivo não interrompe os demais.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+MAX_PROCESSOS = int(os.getenv('JURIA_PROCESSOS_INGESTAO', str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_trava_pool = threading.Lock()
+
+
+def extrair_arquivo(tipo_arquivo, caminho, chave):
+    """
+    Extrai o texto de um arquivo local direto para o cache de extração, em
+    streaming (PDFs página por página). Executado dentro dos processos do pool.
+    Retorna o número de páginas gravadas.
+    """
+    import cache_extracao
+    from loaders import itera_paginas_pdf, carrega_csv, carrega_txt
+
+    if tipo_arquivo == 'Arquivos .pdf':
+        paginas = (texto for _, texto in itera_paginas_pdf(caminho))
+    elif tipo_arquivo == 'Arquivos .csv':
+        paginas = [carrega_csv(caminho)]
+    elif tipo_arquivo == 'Arquivos .txt':
+        paginas = [carrega_txt(caminho)]
+    else:
+        raise ValueError(f'Tipo de arquivo não suportado: {tipo_arquivo}')
+    return cache_extracao.guardar_paginas(chave, paginas, limitar=False)
+
+
+def _obter_pool():
+    global _pool
+    with _trava_pool:
+        if _pool is None:
+            # 'spawn' evita herdar por fork as threads do servidor do Streamlit
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESSOS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _trava_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def extrair_em_paralelo(tarefas, ao_progredir=None):
+    """
+    Extrai para o cache o texto de cada tarefa (tipo_arquivo, caminho, chave).
+
+    Retorna uma lista na mesma ordem das tarefas com pares (páginas, erro), em
+    que exatamente um dos dois é None. `ao_progredir(concluidas, total)` é chamada no
+    thread de quem chamou a função a cada arquivo concluído.
+    """
+    total = len(tarefas)
+    resultados = [None] * total
+    if total == 0:
+        return resultados
+    try:
+        return _extrair(tarefas, resultados, ao_progredir)
+    finally:
+        # Limite de tamanho aplicado uma vez, aqui, sem remover os itens do próprio lote
+        import cache_extracao
+        cache_extracao.aplicar_limite([chave for _, _, chave in tarefas])
+
+
+def _extrair(tarefas, resultados, ao_progredir):
+    total = len(tarefas)
+
+    if total == 1 or MAX_PROCESSOS <= 1:
+        # Um único arquivo não compensa o custo de despachar para outro processo
+        for posicao, tarefa in enumerate(tarefas):
+            try:
+                resultados[posicao] = (extrair_arquivo(*tarefa), None)
+            except Exception as e:
+                resultados[posicao] = (None, str(e))
+            if ao_progredir:
+                ao_progredir(posicao + 1, total)
+        return resultados
+
+    pool = _obter_pool()
+    futuros = {pool.submit(extrair_arquivo, *tarefa): posicao for posicao, tarefa in enumerate(tarefas)}
+    concluidas = 0
+    pool_quebrado = False
+    for futuro in as_completed(futuros):
+        posicao = futuros[futuro]
+        try:
+            resultados[posicao] = (futuro.result(), None)
+        except BrokenProcessPool as e:
+            # Um worker morreu (ex.: falta de memória); o pool é recriado na próxima chamada
+            pool_quebrado = True
+            resultados[posicao] = (None, f'Processo de extração encerrado inesperadamente: {e}')
+        except Exception as e:
+            resultados[posicao] = (None, str(e))
+        concluidas += 1
+        if ao_progredir:
+            ao_progredir(concluidas, total)
+    if pool_quebrado:
+        _descartar_pool()
+    return resultados
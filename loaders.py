@@ -1,32 +1,34 @@
-from langchain_community.document_loaders import (WebBaseLoader,
-                                                  YoutubeLoader,
-                                                  CSVLoader,
-                                                  PyPDFLoader,
-                                                  TextLoader
-                                                  )
-
-
 import os
 import tempfile
+import shutil
 import re
 import urllib.parse
-import requests
-import moviepy.editor as mp
-from pydub import AudioSegment
-import speech_recognition as sr
-import datetime
 import base64
 import streamlit as st
-from pytube import YouTube
-import gdown
 
 
 from dotenv import load_dotenv
-from notion_client import Client
+
+from trabalhos_transcricao import TRABALHOS, TrabalhoTranscricao, iniciar_trabalho
+from uploads import hash_upload, salvar_upload
+import cache_youtube
+from notion_consulta import LIMITE_LINHAS_PERGUNTA, consulta_da_pergunta
+from notion_espelho import EspelhoNotion, texto_propriedades
+from notion_limites import ClienteNotion
+from notion_tabela import consulta_tabela, tabela_notion, texto_resultado
+from transcricao import transcrever_arquivo, transcricao_salva, juntar_textos, TEXTO_INAUDIVEL, TEXTO_ERRO_API
+
+# As dependências pesadas (langchain_community, speech_recognition, pytube,
+# youtube_transcript_api, gdown, pypdf, notion_client) são importadas dentro das
+# funções que as usam, para que só sejam carregadas quando aquele tipo de fonte
+# é selecionado.
 
 #Load environment variables
 load_dotenv()
 
+# Altere sempre que a extração de texto de algum loader mudar: invalida o cache de extração
+VERSAO_LOADERS = '2'
+
 def extrair_id_video_youtube(url):
     """Extrai o ID do vídeo a partir de um link do YouTube"""
     # Padrões possíveis de URLs do YouTube
@@ -75,84 +77,103 @@ def extrair_id_arquivo_google_drive(url):
 
 
 def carrega_site(url):
+    from langchain_community.document_loaders import WebBaseLoader
+
     loader = WebBaseLoader(url)
     lista_documentos = loader.load()
     documento = '\n\n'.join([doc.page_content for doc in lista_documentos])
     return  documento
 
 
+IDIOMAS_LEGENDAS = ['pt-BR', 'pt', 'pt-PT']
+
+def legendas_youtube(id_video, idiomas=IDIOMAS_LEGENDAS):
+    """
+    Legendas publicadas do vídeo em português (manuais têm preferência sobre as
+    automáticas), como segmentos {'inicio', 'fim', 'texto'}. Retorna None se o
+    vídeo não tiver legendas no idioma ou se elas não puderem ser obtidas.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    try:
+        legendas = YouTubeTranscriptApi.list_transcripts(id_video).find_transcript(idiomas).fetch()
+    except Exception:
+        return None
+    segmentos = []
+    for item in legendas:
+        # Versões novas da biblioteca devolvem objetos; as antigas, dicionários
+        if isinstance(item, dict):
+            texto, inicio, duracao = item['text'], item['start'], item['duration']
+        else:
+            texto, inicio, duracao = item.text, item.start, item.duration
+        texto = ' '.join(texto.split())
+        if texto:
+            segmentos.append({'inicio': inicio, 'fim': inicio + duracao, 'texto': texto})
+    return segmentos or None
+
 def carrega_youtube(url):
-    """Carrega e transcreve conteúdo de um vídeo do YouTube"""
+    """
+    Carrega a transcrição de um vídeo do YouTube, do caminho mais rápido para o
+    mais lento: cache local pelo id do vídeo, legendas publicadas em português
+    e, só em último caso, download do áudio e reconhecimento de fala.
+    """
+    temp_dir = None
     try:
-        with st.spinner('Baixando vídeo do YouTube...'):
-            id_video = extrair_id_video_youtube(url)
-            if not id_video:
-                return f"Erro: URL ou ID do YouTube inválido: {url}"
-            
-            # Criar diretório temporário para download
-            temp_dir = tempfile.mkdtemp()
-            yt = YouTube(f"https://www.youtube.com/watch?v={id_video}")
-            
-            # Obter informações do vídeo
-            titulo = yt.title
-            duracao = yt.length
-            
-            # Baixar o vídeo (apenas áudio para economizar tempo)
-            audio_stream = yt.streams.filter(only_audio=True).first()
-            audio_path = audio_stream.download(output_path=temp_dir)
-            
-            # Converter para wav para processamento
-            wav_path = os.path.join(temp_dir, 'audio.wav')
-            audio = AudioSegment.from_file(audio_path)
-            audio.export(wav_path, format="wav")
-        
-        with st.spinner('Transcrevendo áudio do YouTube...'):
-            # Usar o mesmo método de transcrição que usamos para MP4
-            recognizer = sr.Recognizer()
-            
-            # Dividir áudio em chunks para melhor reconhecimento
-            sound = AudioSegment.from_wav(wav_path)
-            chunks = []
-            chunk_size = 60000  # 60 segundos por chunk
-            for i in range(0, len(sound), chunk_size):
-                chunk = sound[i:i+chunk_size]
-                chunk_path = os.path.join(temp_dir, f"chunk_{i}.wav")
-                chunk.export(chunk_path, format="wav")
-                chunks.append(chunk_path)
-            
-            transcricao = ""
-            for i, chunk_path in enumerate(chunks):
-                with sr.AudioFile(chunk_path) as source:
-                    audio_data = recognizer.record(source)
-                    try:
-                        parte_texto = recognizer.recognize_google(audio_data, language="pt-BR")
-                        transcricao += parte_texto + " "
-                    except sr.UnknownValueError:
-                        transcricao += "[Trecho inaudível] "
-                    except sr.RequestError:
-                        transcricao += "[Erro na API de reconhecimento] "
-                
-                # Limpar arquivo temporário
-                os.remove(chunk_path)
-            
-            # Salvar a transcrição na sessão para download posterior
-            st.session_state[f'transcricao_youtube_{id_video}'] = transcricao
-            st.session_state[f'duracao_youtube_{id_video}'] = duracao
-            st.session_state[f'titulo_youtube_{id_video}'] = titulo
-            st.session_state[f'mostrar_download_youtube_{id_video}'] = True
-            
-            # Limpar arquivos temporários
-            os.remove(wav_path)
-            os.remove(audio_path)
-            os.rmdir(temp_dir)
-            
-            return transcricao.strip()
+        id_video = extrair_id_video_youtube(url)
+        if not id_video:
+            return f"Erro: URL ou ID do YouTube inválido: {url}"
+
+        dados = cache_youtube.obter(id_video)
+        if dados is None:
+            with st.spinner('Buscando legendas do YouTube...'):
+                segmentos = legendas_youtube(id_video)
+            if segmentos is not None:
+                dados = cache_youtube.dados_video(id_video, segmentos, 'legendas')
+                cache_youtube.guardar(id_video, dados)
+            else:
+                from pytube import YouTube
+
+                with st.spinner('Baixando vídeo do YouTube...'):
+                    yt = YouTube(f"https://www.youtube.com/watch?v={id_video}")
+                    # Criar diretório temporário para download
+                    temp_dir = tempfile.mkdtemp()
+                    # Baixar o vídeo (apenas áudio para economizar tempo)
+                    audio_stream = yt.streams.filter(only_audio=True).first()
+                    audio_path = audio_stream.download(output_path=temp_dir)
+
+                with st.spinner('Transcrevendo áudio do YouTube...'):
+                    # Mesmo motor de transcrição usado para MP4; retoma do último
+                    # trecho salvo se uma execução anterior foi interrompida
+                    segmentos = transcrever_arquivo(audio_path, hash_midia=f'youtube:{id_video}')
+                dados = cache_youtube.dados_video(id_video, segmentos, 'asr', titulo=yt.title, duracao=yt.length)
+                # Trechos com erro de API ficam de fora do cache: a próxima
+                # carga repete só esses trechos (ver checkpoint_transcricao)
+                if not any(TEXTO_ERRO_API in s['texto'] for s in segmentos):
+                    cache_youtube.guardar(id_video, dados)
+
+        segmentos = dados['segmentos']
+        transcricao = juntar_textos(s['texto'] for s in segmentos)
+
+        # Salvar a transcrição na sessão para download posterior
+        st.session_state[f'transcricao_youtube_{id_video}'] = transcricao
+        st.session_state[f'duracao_youtube_{id_video}'] = dados['duracao']
+        st.session_state[f'segmentos_youtube_{id_video}'] = segmentos
+        st.session_state[f'titulo_youtube_{id_video}'] = dados['titulo']
+        st.session_state[f'mostrar_download_youtube_{id_video}'] = True
+
+        return transcricao.strip()
     except Exception as e:
         st.error(f"Erro ao processar o vídeo do YouTube: {str(e)}")
         return f"Erro na transcrição do YouTube: {str(e)}"
+    finally:
+        # Limpar arquivos temporários, inclusive em caso de erro
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 def carrega_google_drive(url):
     """Carrega conteúdo de um arquivo do Google Drive"""
+    import gdown
+
     try:
         with st.spinner('Baixando arquivo do Google Drive...'):
             file_id = extrair_id_arquivo_google_drive(url)
@@ -225,9 +246,16 @@ def carrega_google_drive(url):
                             self.path = path
                             self.name = name
                             
-                        def read(self):
-                            with open(self.path, 'rb') as f:
-                                return f.read()
+                            self._arquivo = None
+                            
+                        def read(self, tamanho=-1):
+                            if self._arquivo is None:
+                                self._arquivo = open(self.path, 'rb')
+                            dados = self._arquivo.read(tamanho)
+                            if not dados:
+                                self._arquivo.close()
+                                self._arquivo = None
+                            return dados
                     
                     mock_file = MockUploadedFile(output_with_ext, f"gdrive_{file_id}.mp4")
                     transcricao, duracao = transcrever_mp4(mock_file)
@@ -247,20 +275,37 @@ def carrega_google_drive(url):
 
 
 def carrega_csv(caminho):
+    from langchain_community.document_loaders import CSVLoader
+
     loader = CSVLoader(caminho)
     lista_documentos = loader.load()
     documento = '\n\n'.join([doc.page_content for doc in lista_documentos])
     return  documento
 
 
+def itera_paginas_pdf(caminho):
+    """
+    Lê o PDF página por página, gerando pares (número da página, texto).
+    Apenas a página corrente fica em memória.
+    """
+    from pypdf import PdfReader
+
+    # Com um caminho, o pypdf lê o arquivo inteiro para um BytesIO; com o
+    # arquivo aberto, os objetos são lidos do disco sob demanda
+    with open(caminho, 'rb') as arquivo:
+        leitor = PdfReader(arquivo)
+        for numero, pagina in enumerate(leitor.pages, start=1):
+            yield numero, pagina.extract_text() or ''
+
+
 def carrega_pdf(caminho):
-    loader = PyPDFLoader(caminho)
-    lista_documentos = loader.load()
-    documento = '\n\n'.join([doc.page_content for doc in lista_documentos])
+    documento = '\n\n'.join(texto for _, texto in itera_paginas_pdf(caminho))
     return  documento
 
 
 def carrega_txt(caminho):
+    from langchain_community.document_loaders import TextLoader
+
     loader = TextLoader(caminho)
     lista_documentos = loader.load()
     documento = '\n\n'.join([doc.page_content for doc in lista_documentos])
@@ -295,241 +340,248 @@ def carrega_notion(notion_page_id=None):
             return "Erro: ID da página ou banco de dados do Notion não fornecido"
         
         # Initialize Notion client
-        notion = Client(auth=notion_api_key)
+        # Client com controle de taxa compartilhado entre sessões (ver notion_limites)
+        notion = ClienteNotion(auth=notion_api_key)
+        espelho = EspelhoNotion()
         
-        # Try to determine if the ID is for a page or database
-        try:
-            # First try to retrieve as a page
-            notion.pages.retrieve(page_id=notion_page_id)
-            is_database = False
-        except Exception:
+        # O tipo da fonte (página ou banco) fica salvo no espelho; só é
+        # descoberto pela API na primeira vez
+        fonte = espelho.fonte(notion_page_id)
+        if fonte is not None:
+            tipo = fonte['tipo']
+        else:
             try:
-                # If not a page, try as a database
-                notion.databases.retrieve(database_id=notion_page_id)
-                is_database = True
-            except Exception as e:
-                return f"Erro: ID fornecido não é válido como página ou banco de dados: {str(e)}"
-        
-        text_content = []
+                # First try to retrieve as a page
+                notion.pages.retrieve(page_id=notion_page_id)
+                tipo = 'pagina'
+            except Exception:
+                try:
+                    # If not a page, try as a database
+                    notion.databases.retrieve(database_id=notion_page_id)
+                    tipo = 'banco'
+                except Exception as e:
+                    return f"Erro: ID fornecido não é válido como página ou banco de dados: {str(e)}"
         
-        
-        # Handle page content
-        if not is_database:
-            # Extract text content from page blocks
-            page_content = notion.blocks.children.list(block_id=notion_page_id)
-            
-            # Process page blocks
-            for block in page_content['results']:
-                block_type = block.get('type')
-                if block_type in ['paragraph', 'heading_1', 'heading_2', 'heading_3', 
-                                 'bulleted_list_item', 'numbered_list_item', 'to_do', 
-                                 'quote', 'callout']:
-                    # Extract text from different block types
-                    text = block.get(block_type, {}).get('rich_text', [])
-                    if text:
-                        text_content.append(''.join([t.get('plain_text', '') for t in text]))
-        
-        # Handle database content
-        else:
-            # Query database entries with pagination
-            #text_content = []
-            has_more = True
-    
-            start_cursor = None
-            while has_more:
-                # Adicione um page_size para controlar quantidade de registros
-
-                database_entries = notion.databases.query(
-                    database_id=notion_page_id, 
-                    start_cursor=start_cursor
-                    #page_size=300
-                    )
-                ''' 1-Paginação: Adicionei um loop while True para lidar com a paginação dos resultados do banco de dados. A função notion.databases.query é chamada repetidamente até que todos os resultados sejam recuperados.
-                2-Cursor: Usei start_cursor para rastrear a posição atual na paginação. Se houver mais páginas de resultados (has_more), o cursor é atualizado para next_cursor e a consulta continua.
-                3-Processamento de Propriedades: O processamento das propriedades de cada entrada do banco de dados permanece o mesmo, mas agora é garantido que todos os registros sejam processados.
-                '''   
-                print(f"Total de registros recuperados: {len(database_entries['results'])}")
-
-
-                  # Debug: Print the raw response from the API
-                if not database_entries['results']:
-                    break # break if no results       
-                         
-                # Process each database row
-                for entry in database_entries['results']:
-                    row_content = []
-                    properties = entry.get('properties', {})
-                    
-                    # Process each property in the row
-                    for prop_name, prop_data in properties.items():
-                        prop_type = prop_data.get('type')
-                        
-                        # Handle different property types
-                        if prop_type == 'title':
-                            title_text = prop_data.get('title', [])
-                            if title_text:
-                                row_content.append(f"{prop_name}: {''.join([t.get('plain_text', '') for t in title_text])}")
-                        
-                        elif prop_type == 'rich_text':
-                            rich_text = prop_data.get('rich_text', [])
-                            if rich_text:
-                                row_content.append(f"{prop_name}: {''.join([t.get('plain_text', '') for t in rich_text])}")
-                        
-                        elif prop_type == 'number':
-                            number = prop_data.get('number')
-                            if number is not None:
-                                row_content.append(f"{prop_name}: {number}")
-                        
-                        elif prop_type == 'select':
-                            select = prop_data.get('select', {})
-                            if select and select.get('name'):
-                                row_content.append(f"{prop_name}: {select.get('name')}")
-                        
-                        elif prop_type == 'multi_select':
-                            multi_select = prop_data.get('multi_select', [])
-                            if multi_select:
-                                values = [item.get('name', '') for item in multi_select if item.get('name')]
-                                if values:
-                                    row_content.append(f"{prop_name}: {', '.join(values)}")
-                        
-                        elif prop_type == 'date':
-                            date = prop_data.get('date', {})
-                            if date and date.get('start'):
-                                date_text = date.get('start')
-                                if date.get('end'):
-                                    date_text += f" - {date.get('end')}"
-                                row_content.append(f"{prop_name}: {date_text}")
-                        
-                        elif prop_type == 'checkbox':
-                            checkbox = prop_data.get('checkbox')
-                            if checkbox is not None:
-                                row_content.append(f"{prop_name}: {'Sim' if checkbox else 'Não'}")
-                    
-                    # Add the row content as a paragraph
-                    if row_content:
-                        text_content.append(' | '.join(row_content))
-                
-                # Check if there are more pages of results
-                if not database_entries.get('has_more'):
-                    break
-                has_more = database_entries.get('has_more', False)
-                start_cursor = database_entries.get('next_cursor')
+        if tipo == 'banco':
+            # Bancos carregados podem ser consultados direto pela pergunta (consulta_notion_pergunta)
+            st.session_state.setdefault('bancos_notion', {})[notion_page_id] = True
+
+        # Sincroniza só o que mudou desde a última vez e lê o texto do espelho local
+        try:
+            espelho.sincronizar(notion, notion_page_id, tipo)
+        except Exception as e:
+            if fonte is None:
+                raise
+            st.warning(f"Não foi possível atualizar o Notion; usando a cópia local: {str(e)}")
+        text_content = espelho.texto(notion_page_id)
         
         # Return error message if no content was found
         if not text_content:
             return "Aviso: Nenhum conteúdo de texto encontrado na página ou banco de dados do Notion"
             
-        return '\n\n'.join(text_content)
+        return text_content
     
     except Exception as e:
         return f"Erro ao carregar conteúdo do Notion: {str(e)}"
+
+
+LINHAS_POR_TRECHO_NOTION = 25
+
+
+def esquecer_banco_notion(id_banco):
+    """Tira o banco das consultas feitas a cada pergunta (quando a fonte é removida do corpus)."""
+    st.session_state.get('bancos_notion', {}).pop(id_banco, None)
+    st.session_state.get('tabelas_notion', {}).pop(id_banco, None)
+
+
+def consulta_notion_pergunta(pergunta):
+    """
+    Trechos com as linhas dos bancos do Notion carregados que atendem aos
+    filtros tirados da pergunta (período, valores de select/status), lidas do
+    espelho local, sem chamadas à API (ver notion_consulta). No máximo
+    LIMITE_LINHAS_PERGUNTA linhas no total; vazio se a pergunta não tiver
+    filtros aplicáveis ou se a consulta falhar.
+    """
+    bancos = st.session_state.get('bancos_notion', {})
+    if not bancos:
+        return []
+    trechos = []
+    restantes = LIMITE_LINHAS_PERGUNTA
+    try:
+        espelho = EspelhoNotion()
+        for id_banco in bancos:
+            esquema = espelho.esquema(id_banco)
+            consulta = consulta_da_pergunta(pergunta, esquema) if esquema else None
+            if consulta is None or restantes <= 0:
+                continue
+            linhas = consulta.aplicar(espelho.linhas(id_banco), limite=restantes)
+            textos = [texto for texto in map(texto_propriedades, linhas) if texto]
+            restantes -= len(linhas)
+            for inicio in range(0, len(textos), LINHAS_POR_TRECHO_NOTION):
+                trechos.append({'texto': '\n'.join(textos[inicio:inicio + LINHAS_POR_TRECHO_NOTION]),
+                                'fonte': f'Notion {id_banco} (consulta)', 'pagina': None})
+    except Exception:
+        return []
+    return trechos
+
+
+def resposta_estruturada_notion(pergunta):
+    """
+    Resultados exatos (contagem, filtro ou agregação) da pergunta sobre os
+    bancos do Notion carregados, calculados na tabela tipada do espelho local
+    (ver notion_tabela). Retorna (principais, complementares): trechos de
+    bancos citados na pergunta, que bastam como contexto, e trechos de bancos
+    não citados, que só complementam a busca normal. Vazios se a pergunta não
+    for estruturada ou se o cálculo falhar.
+    """
+    bancos = st.session_state.get('bancos_notion', {})
+    if not bancos:
+        return [], []
+    principais, complementares = [], []
+    try:
+        espelho = EspelhoNotion()
+        # Tabelas reconstruídas só quando o espelho é sincronizado de novo
+        tabelas = st.session_state.setdefault('tabelas_notion', {})
+        for id_banco in bancos:
+            fonte = espelho.fonte(id_banco)
+            if fonte is None:
+                continue
+            versao, tabela = tabelas.get(id_banco, (None, None))
+            if versao != fonte['sincronizado_em']:
+                tabela = tabela_notion(espelho.linhas(id_banco), fonte['esquema'])
+                tabelas[id_banco] = (fonte['sincronizado_em'], tabela)
+            resposta = consulta_tabela(pergunta, tabela)
+            if resposta is not None:
+                trecho = {'texto': texto_resultado(resposta, len(tabela)),
+                          'fonte': f'Notion {id_banco} (tabela)', 'pagina': None}
+                (principais if resposta['cita_banco'] else complementares).append(trecho)
+    except Exception:
+        return [], []
+    return principais, complementares
         
+def iniciar_transcricao_mp4(arquivo_mp4):
+    """
+    Inicia a transcrição de um MP4 em segundo plano e retorna o trabalho
+    (ver trabalhos_transcricao). Se o arquivo já foi transcrito, o trabalho
+    volta concluído, com os segmentos salvos.
+    """
+    # Hash antes da gravação: mídia já transcrita ou em transcrição não
+    # precisa ir para o disco
+    hash_midia = hash_upload(arquivo_mp4)
+    em_andamento = TRABALHOS.get(hash_midia)
+    if em_andamento is not None:
+        return em_andamento
+    salvos = transcricao_salva(hash_midia)
+    if salvos is not None:
+        return TrabalhoTranscricao.concluido(arquivo_mp4.name, hash_midia, salvos)
+    caminho, hash_midia = salvar_upload(arquivo_mp4, sufixo='.mp4')
+    return iniciar_trabalho(arquivo_mp4.name, hash_midia, caminho)
+
 def transcrever_mp4(arquivo_mp4):
     """
     Extrai o áudio de um arquivo MP4 e realiza a transcrição do conteúdo falado.
     Retorna a transcrição e a duração do vídeo.
     """
+    video_path = None
+    nome_arquivo = arquivo_mp4.name.replace('.mp4', '')
     try:
-        with st.spinner('Extraindo áudio do vídeo...'):
-            # Salvar o arquivo temporariamente
-            with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_video:
-                temp_video.write(arquivo_mp4.read())
-                video_path = temp_video.name
-            
-            # Extrair áudio do vídeo
-            video = mp.VideoFileClip(video_path)
-            duracao_total = video.duration
-            audio_path = video_path.replace('.mp4', '.wav')
-            video.audio.write_audiofile(audio_path, codec='pcm_s16le')
-            video.close()
-            
+        # Hash calculado sobre o buffer do upload; o arquivo só vai para o
+        # disco se a transcrição ainda não estiver salva
+        hash_midia = hash_upload(arquivo_mp4)
+        segmentos = transcricao_salva(hash_midia)
+        if segmentos is not None:
+            # Transcrição já concluída antes: servida direto dos checkpoints
+            transcricao = juntar_textos(s['texto'] for s in segmentos)
+            duracao_total = segmentos[-1]['fim'] if segmentos else 0
+            st.session_state[f'transcricao_{nome_arquivo}'] = transcricao
+            st.session_state[f'duracao_{nome_arquivo}'] = duracao_total
+            st.session_state[f'segmentos_{nome_arquivo}'] = segmentos
+            return transcricao.strip(), duracao_total
+
+        video_path, hash_midia = salvar_upload(arquivo_mp4, sufixo='.mp4')
         with st.spinner('Transcrevendo áudio...'):
-            # Converter para formato compatível com speech_recognition
-            sound = AudioSegment.from_wav(audio_path)
-            
-            # Usando reconhecimento de fala
-            recognizer = sr.Recognizer()
-            
-            # Dividir áudio em chunks para melhor reconhecimento
-            chunks = []
-            chunk_size = 60000  # 60 segundos por chunk
-            for i in range(0, len(sound), chunk_size):
-                chunk = sound[i:i+chunk_size]
-                chunk_path = f"{audio_path.replace('.wav', '')}_{i}.wav"
-                chunk.export(chunk_path, format="wav")
-                chunks.append(chunk_path)
-            
-            transcricao = ""
-            for i, chunk_path in enumerate(chunks):
-                with sr.AudioFile(chunk_path) as source:
-                    audio_data = recognizer.record(source)
-                    try:
-                        parte_texto = recognizer.recognize_google(audio_data, language="pt-BR")
-                        transcricao += parte_texto + " "
-                    except sr.UnknownValueError:
-                        transcricao += "[Trecho inaudível] "
-                    except sr.RequestError:
-                        transcricao += "[Erro na API de reconhecimento] "
-                
-                # Limpar arquivos temporários
-                os.remove(chunk_path)
-                
-            # Limpar arquivos temporários
-            os.remove(audio_path)
-            os.remove(video_path)
+            progresso = st.progress(0.0)
+            # O ffmpeg extrai só a faixa de áudio, já em 16 kHz mono, direto para
+            # a memória. Cada trecho é salvo ao terminar: se algo falhar, a
+            # próxima tentativa só processa os trechos que faltam
+            segmentos = transcrever_arquivo(
+                video_path,
+                hash_midia=hash_midia,
+                ao_concluir=lambda feitos, total: progresso.progress(feitos / total, text=f'Trecho {feitos} de {total}')
+            )
+            transcricao = juntar_textos(s['texto'] for s in segmentos)
+            duracao_total = segmentos[-1]['fim'] if segmentos else 0
+            progresso.empty()
             
             # Salvar a transcrição na sessão para download posterior
-            nome_arquivo = arquivo_mp4.name.replace('.mp4', '')
             st.session_state[f'transcricao_{nome_arquivo}'] = transcricao
             st.session_state[f'duracao_{nome_arquivo}'] = duracao_total
+            st.session_state[f'segmentos_{nome_arquivo}'] = segmentos
             
             return transcricao.strip(), duracao_total
     except Exception as e:
         st.error(f"Erro ao processar o arquivo MP4: {str(e)}")
         return f"Erro na transcrição: {str(e)}", 0
+    finally:
+        # Limpar o arquivo temporário, inclusive em caso de erro
+        if video_path and os.path.exists(video_path):
+            os.remove(video_path)
 
-def gerar_arquivo_srt(transcricao, duracao_total):
+def formata_tempo(segundos, separador=','):
+    """Tempo em segundos no formato HH:MM:SS,mmm (SRT) ou HH:MM:SS.mmm (WebVTT)."""
+    milissegundos = int(round(max(segundos, 0) * 1000))
+    horas, milissegundos = divmod(milissegundos, 3_600_000)
+    minutos, milissegundos = divmod(milissegundos, 60_000)
+    segundos, milissegundos = divmod(milissegundos, 1000)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}{separador}{milissegundos:03d}"
+
+def legendas(segmentos, palavras_por_legenda=10):
     """
-    Converte a transcrição em formato SRT com timestamps.
+    Divide cada segmento transcrito em legendas de até `palavras_por_legenda`
+    palavras. O tempo de cada legenda é repartido dentro do seu segmento, em
+    proporção ao número de caracteres, de modo que o erro nunca passa de um
+    segmento. Trechos inaudíveis ou com erro não geram legenda.
     """
-    # Dividir o texto em segmentos para criar legendas
-    palavras = transcricao.split()
-    segmentos = []
-    
-    # Criar segmentos de aproximadamente 10 palavras
-    tamanho_segmento = 10
-    for i in range(0, len(palavras), tamanho_segmento):
-        segmento = " ".join(palavras[i:i+tamanho_segmento])
-        segmentos.append(segmento)
-    
-    # Calcular duracao média por segmento
-    tempo_por_segmento = duracao_total / len(segmentos) if segmentos else 0
-    
-    # Formatar como SRT
-    conteudo_srt = ""
-    for i, segmento in enumerate(segmentos):
-        numero = i + 1
-        tempo_inicio = i * tempo_por_segmento
-        tempo_fim = (i + 1) * tempo_por_segmento
-        
-        # Formatar tempos no formato SRT (HH:MM:SS,mmm)
-        inicio_formatado = str(datetime.timedelta(seconds=tempo_inicio)).replace('.', ',')
-        if ',' not in inicio_formatado:
-            inicio_formatado += ',000'
-        
-        fim_formatado = str(datetime.timedelta(seconds=tempo_fim)).replace('.', ',')
-        if ',' not in fim_formatado:
-            fim_formatado += ',000'
-        
-        # Adicionar zeros à esquerda para garantir o formato correto (HH:MM:SS)
-        if len(inicio_formatado.split(':')[0]) == 1:
-            inicio_formatado = '0' + inicio_formatado
-        if len(fim_formatado.split(':')[0]) == 1:
-            fim_formatado = '0' + fim_formatado
-        
-        conteudo_srt += f"{numero}\n{inicio_formatado} --> {fim_formatado}\n{segmento}\n\n"
-    
-    return conteudo_srt
+    for segmento in segmentos:
+        texto = segmento['texto']
+        if not texto or texto in (TEXTO_INAUDIVEL, TEXTO_ERRO_API):
+            continue
+        palavras = texto.split()
+        blocos = [' '.join(palavras[i:i + palavras_por_legenda]) for i in range(0, len(palavras), palavras_por_legenda)]
+        total_caracteres = sum(len(bloco) for bloco in blocos) or 1
+        duracao = segmento['fim'] - segmento['inicio']
+        inicio = segmento['inicio']
+        caracteres = 0
+        for bloco in blocos:
+            caracteres += len(bloco)
+            fim = segmento['inicio'] + duracao * caracteres / total_caracteres
+            yield inicio, fim, bloco
+            inicio = fim
+
+def _segmentos_ou_estimativa(transcricao, duracao_total, segmentos):
+    # Sem os tempos reais (transcrições antigas), distribui o texto pela duração total
+    return segmentos or [{'inicio': 0, 'fim': duracao_total, 'texto': transcricao}]
+
+def gerar_arquivo_srt(transcricao, duracao_total, segmentos=None):
+    """
+    Converte a transcrição em formato SRT, com os tempos reais dos segmentos
+    quando disponíveis.
+    """
+    return ''.join(
+        f"{numero}\n{formata_tempo(inicio)} --> {formata_tempo(fim)}\n{texto}\n\n"
+        for numero, (inicio, fim, texto) in enumerate(
+            legendas(_segmentos_ou_estimativa(transcricao, duracao_total, segmentos)), start=1)
+    )
+
+def gerar_arquivo_vtt(transcricao, duracao_total, segmentos=None):
+    """
+    Converte a transcrição em formato WebVTT, com os tempos reais dos segmentos
+    quando disponíveis.
+    """
+    return 'WEBVTT\n\n' + ''.join(
+        f"{formata_tempo(inicio, '.')} --> {formata_tempo(fim, '.')}\n{texto}\n\n"
+        for inicio, fim, texto in legendas(_segmentos_ou_estimativa(transcricao, duracao_total, segmentos))
+    )
 
 def download_link(conteudo, nome_arquivo, texto_link):
     """
@@ -539,13 +591,13 @@ def download_link(conteudo, nome_arquivo, texto_link):
     href = f'<a href="data:file/txt;base64,{b64}" download="{nome_arquivo}">{texto_link}</a>'
     return href
 
-def mostrar_opcoes_download(nome_arquivo_base, transcricao, duracao):
+def mostrar_opcoes_download(nome_arquivo_base, transcricao, duracao, segmentos=None):
     """
-    Exibe opções para download da transcrição em formatos .txt e .srt
+    Exibe opções para download da transcrição em formatos .txt, .srt e .vtt
     """
     st.subheader(f"Download da transcrição: {nome_arquivo_base}")
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown(
@@ -554,8 +606,15 @@ def mostrar_opcoes_download(nome_arquivo_base, transcricao, duracao):
         )
     
     with col2:
-        conteudo_srt = gerar_arquivo_srt(transcricao, duracao)
+        conteudo_srt = gerar_arquivo_srt(transcricao, duracao, segmentos)
         st.markdown(
             download_link(conteudo_srt, f"{nome_arquivo_base}.srt", "🎬 Baixar legendas em formato .srt"),
             unsafe_allow_html=True
         )
+    
+    with col3:
+        conteudo_vtt = gerar_arquivo_vtt(transcricao, duracao, segmentos)
+        st.markdown(
+            download_link(conteudo_vtt, f"{nome_arquivo_base}.vtt", "🌐 Baixar legendas em formato .vtt"),
+            unsafe_allow_html=True
+        )
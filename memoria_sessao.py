@@ -0,0 +1,103 @@
+"""
+Memória de conversa por sessão, com tamanho limitado.
+
+Substitui o ConversationBufferMemory global: cada sessão do Streamlit tem a sua
+instância e o histórico enviado ao modelo fica limitado a uma janela de tokens.
+No modo 'resumo', as mensagens que saem da janela são condensadas em um resumo
+contínuo, enviado junto com as mensagens recentes. A contagem de tokens de cada
+mensagem é feita uma única vez, ao ser adicionada, e o corte da janela é O(1)
+amortizado.
+"""
+import os
+from collections import deque
+
+from orcamento_tokens import conta_tokens, TOKENS_POR_MENSAGEM
+
+
+MODOS_MEMORIA = ['janela', 'resumo']
+MODO_PADRAO = os.getenv('JURIA_MODO_MEMORIA', 'janela')
+LIMITE_TOKENS_HISTORICO = int(os.getenv('JURIA_LIMITE_HISTORICO', '3000'))
+MAX_MENSAGENS_EXIBIDAS = 200
+MODELO_CONTAGEM = 'gpt-4.1'
+
+
+def prompt_resumo(resumo, mensagens):
+    """Prompt para atualizar o resumo contínuo com mensagens que saíram da janela."""
+    conversa = '\n'.join(f'{mensagem.type}: {mensagem.content}' for mensagem in mensagens)
+    return (
+        'Atualize o resumo de uma conversa entre um usuário e a JúrIA, assistente do CAOJÚRI. '
+        'Preserve nomes, números de processos, datas e conclusões. Responda apenas com o novo resumo, '
+        'em no máximo 200 palavras.\n\n'
+        f'Resumo atual:\n{resumo or "(vazio)"}\n\n'
+        f'Novas mensagens:\n{conversa}\n\n'
+        'Novo resumo:'
+    )
+
+
+class MemoriaSessao:
+    """Histórico de uma sessão com janela de tokens e, opcionalmente, resumo contínuo."""
+
+    def __init__(self, modo=MODO_PADRAO, limite_tokens=LIMITE_TOKENS_HISTORICO, modelo=MODELO_CONTAGEM):
+        self.modo = modo if modo in MODOS_MEMORIA else 'janela'
+        self.limite_tokens = limite_tokens
+        self.modelo = modelo
+        self.resumo = ''
+        self._exibicao = deque(maxlen=MAX_MENSAGENS_EXIBIDAS)
+        self._janela = deque()  # (mensagem, tokens)
+        self._tokens_janela = 0
+        self._fora_da_janela = []  # mensagens ainda não incorporadas ao resumo
+
+    @property
+    def buffer_as_messages(self):
+        """Mensagens recentes para exibição na tela."""
+        return list(self._exibicao)
+
+    @property
+    def tokens_janela(self):
+        return self._tokens_janela
+
+    def _adicionar(self, mensagem):
+        tokens = conta_tokens(mensagem.content, self.modelo) + TOKENS_POR_MENSAGEM
+        self._exibicao.append(mensagem)
+        self._janela.append((mensagem, tokens))
+        self._tokens_janela += tokens
+        # Mantém ao menos a última mensagem, mesmo que sozinha passe do limite
+        while self._tokens_janela > self.limite_tokens and len(self._janela) > 1:
+            antiga, tokens_antiga = self._janela.popleft()
+            self._tokens_janela -= tokens_antiga
+            if self.modo == 'resumo':
+                self._fora_da_janela.append(antiga)
+
+    def adicionar_usuario(self, texto):
+        from langchain_core.messages import HumanMessage
+
+        self._adicionar(HumanMessage(content=texto))
+
+    def adicionar_ia(self, texto):
+        from langchain_core.messages import AIMessage
+
+        self._adicionar(AIMessage(content=texto))
+
+    def mensagens_prompt(self):
+        """Histórico a enviar ao modelo: resumo (se houver) seguido das mensagens da janela."""
+        mensagens = [mensagem for mensagem, _ in self._janela]
+        if self.resumo:
+            from langchain_core.messages import SystemMessage
+
+            mensagens.insert(0, SystemMessage(content=f'Resumo da conversa anterior: {self.resumo}'))
+        return mensagens
+
+    def precisa_resumir(self):
+        return self.modo == 'resumo' and bool(self._fora_da_janela)
+
+    def resumir(self, gerar_resumo):
+        """
+        Incorpora ao resumo as mensagens que saíram da janela.
+        `gerar_resumo(prompt)` deve retornar o texto do novo resumo. Se ela
+        falhar, as mensagens continuam pendentes e o resumo é tentado de novo
+        no próximo turno.
+        """
+        if not self.precisa_resumir():
+            return
+        self.resumo = gerar_resumo(prompt_resumo(self.resumo, self._fora_da_janela)).strip()
+        self._fora_da_janela = []
@@ -0,0 +1,122 @@
+"""
+Leitura completa de páginas do Notion, com os filhos buscados em paralelo.
+
+A API devolve os blocos de uma página em listas paginadas de até 100 itens, e
+os filhos de toggles, colunas, tabelas, listas e subpáginas só vêm em novas
+chamadas. Aqui cada lista é paginada até o fim e, em cada nível, os filhos de
+todos os blocos são buscados ao mesmo tempo com o AsyncClient do notion_client,
+limitados por um semáforo (JURIA_NOTION_CONCORRENCIA requisições simultâneas).
+Como o gather devolve os resultados na ordem das chamadas, a árvore final tem a
+mesma ordem do documento, qualquer que seja a ordem em que as respostas chegam.
+"""
+import asyncio
+import os
+
+from notion_limites import ClienteNotionAsync
+
+
+MAX_CONCORRENCIA = int(os.getenv('JURIA_NOTION_CONCORRENCIA', '3'))
+PROFUNDIDADE_MAXIMA = 12
+TAMANHO_PAGINA = 100  # máximo aceito pela API
+
+TIPOS_BLOCO_TEXTO = ['paragraph', 'heading_1', 'heading_2', 'heading_3', 'bulleted_list_item',
+                     'numbered_list_item', 'to_do', 'quote', 'callout', 'toggle', 'code']
+# Blocos cujos filhos não pertencem à página (bancos e atalhos para outras páginas)
+TIPOS_SEM_DESCIDA = ['child_database', 'link_to_page']
+
+
+def texto_rico(rich_text):
+    return ''.join(t.get('plain_text', '') for t in rich_text or [])
+
+
+def paginar(consulta, tamanho_pagina=TAMANHO_PAGINA, **parametros):
+    """Todos os resultados de um endpoint paginado do Notion (start_cursor/next_cursor)."""
+    cursor = None
+    while True:
+        if cursor:
+            parametros['start_cursor'] = cursor
+        resposta = consulta(page_size=tamanho_pagina, **parametros)
+        yield from resposta.get('results', [])
+        if not resposta.get('has_more'):
+            break
+        cursor = resposta.get('next_cursor')
+
+
+async def listar_filhos(cliente, id_bloco, semaforo):
+    """Todos os filhos diretos de um bloco, paginando a lista até o fim."""
+    filhos, cursor = [], None
+    while True:
+        parametros = {'block_id': id_bloco, 'page_size': TAMANHO_PAGINA}
+        if cursor:
+            parametros['start_cursor'] = cursor
+        async with semaforo:
+            resposta = await cliente.blocks.children.list(**parametros)
+        filhos.extend(resposta.get('results', []))
+        if not resposta.get('has_more'):
+            return filhos
+        cursor = resposta.get('next_cursor')
+
+
+async def arvore_blocos(cliente, id_bloco, semaforo, profundidade=0, visitados=None):
+    """Lista de (bloco, filhos) em ordem do documento, descendo recursivamente."""
+    visitados = set() if visitados is None else visitados
+    visitados.add(id_bloco)
+    blocos = await listar_filhos(cliente, id_bloco, semaforo)
+
+    async def descer(bloco):
+        if (not bloco.get('has_children') or bloco.get('type') in TIPOS_SEM_DESCIDA
+                or bloco['id'] in visitados or profundidade >= PROFUNDIDADE_MAXIMA):
+            return []
+        return await arvore_blocos(cliente, bloco['id'], semaforo, profundidade + 1, visitados)
+
+    filhos = await asyncio.gather(*(descer(bloco) for bloco in blocos))
+    return list(zip(blocos, filhos))
+
+
+def texto_bloco(bloco):
+    """Texto do próprio bloco (sem os filhos)."""
+    tipo = bloco.get('type')
+    dados = bloco.get(tipo, {}) or {}
+    if tipo in TIPOS_BLOCO_TEXTO:
+        texto = texto_rico(dados.get('rich_text'))
+        if tipo == 'to_do' and texto:
+            texto = f"[{'x' if dados.get('checked') else ' '}] {texto}"
+        return texto
+    if tipo == 'child_page':
+        return f"# {dados.get('title', '')}"
+    if tipo == 'child_database':
+        return f"[Banco de dados: {dados.get('title', '')}]"
+    if tipo == 'table_row':
+        return ' | '.join(texto_rico(celula) for celula in dados.get('cells', []))
+    return ''
+
+
+def texto_arvore(nos):
+    """Texto da árvore de blocos, um parágrafo por bloco; linhas de tabela ficam juntas."""
+    partes = []
+
+    def visitar(nos):
+        for bloco, filhos in nos:
+            texto = texto_bloco(bloco)
+            if texto:
+                partes.append(texto)
+            if bloco.get('type') == 'table':
+                linhas = [texto_bloco(linha) for linha, _ in filhos]
+                partes.append('\n'.join(linha for linha in linhas if linha))
+            else:
+                visitar(filhos)
+
+    visitar(nos)
+    return '\n\n'.join(parte for parte in partes if parte)
+
+
+def texto_pagina(auth, id_pagina, max_concorrencia=MAX_CONCORRENCIA):
+    """Texto completo de uma página do Notion, incluindo blocos aninhados e subpáginas."""
+    async def carregar():
+        cliente = ClienteNotionAsync(auth=auth)
+        try:
+            return await arvore_blocos(cliente, id_pagina, asyncio.Semaphore(max_concorrencia))
+        finally:
+            await cliente.aclose()
+
+    return texto_arvore(asyncio.run(carregar()))
@@ -0,0 +1,314 @@
+"""
+Consultas a bancos do Notion com projeção e filtros feitos na API.
+
+Uma ConsultaNotion descreve o que pedir a `databases.query`: as propriedades a
+trazer (filter_properties), o filtro no formato da API e o tamanho da página.
+A ordem das linhas é a do espelho local (ordem de criação). Assim só as linhas e colunas necessárias são transferidas e
+viram texto.
+
+As consultas vêm de dois lugares, que podem ser combinados:
+  - configuração por banco, em um arquivo JSON (JURIA_NOTION_CONSULTAS,
+    padrão 'consultas_notion.json'), usada também pelo espelho local:
+
+        {"<id do banco>": {"propriedades": ["Processo", "Data da sessão", "Status"],
+                           "filtro": {"property": "Status", "select": {"does_not_equal": "Arquivado"}},
+                           "tamanho_pagina": 100}}
+
+  - a pergunta do usuário: períodos ("em março de 2024", "entre 01/02/2024 e
+    15/02/2024", "em 2023") e valores de propriedades select/status citados
+    viram filtro, e nomes de propriedades citados, projeção (ver
+    consulta_da_pergunta). Essas consultas são aplicadas às linhas do espelho
+    local (ConsultaNotion.aplicar), sem chamadas à API a cada pergunta.
+"""
+import calendar
+import datetime
+import json
+import os
+import re
+import unicodedata
+
+from busca_bm25 import stopwords
+from notion_blocos import TAMANHO_PAGINA
+
+
+ARQUIVO_CONSULTAS = os.getenv('JURIA_NOTION_CONSULTAS', 'consultas_notion.json')
+LIMITE_LINHAS_PERGUNTA = 50
+
+MESES = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+# Nomes de propriedades de data preferidos, nesta ordem, quando o banco tem várias
+PREFERENCIA_DATAS = ['sessao', 'julgamento', 'data']
+# Palavras que, antes de um mês ou ano, indicam que se fala de uma data
+# ("em março", não "marco temporal"; "até 05/2024", não "Lei 9/1996")
+_CONTEXTO_DATA = re.compile(r'\b(?:em|mes de|ano de|para|ate|desde|durante|a partir de|entre)\s+$')
+_CONTINUACAO_INTERVALO = re.compile(r'\bentre\b.{1,40}\be\s+$')
+
+
+def e_logico(filtros):
+    """
+    Junta filtros com 'and', achatando 'and's aninhados (a API aceita no máximo
+    dois níveis de filtros compostos). Retorna None se não houver filtros.
+    """
+    partes = []
+    for filtro in filtros:
+        if not filtro:
+            continue
+        partes.extend(filtro['and'] if list(filtro) == ['and'] else [filtro])
+    if not partes:
+        return None
+    return partes[0] if len(partes) == 1 else {'and': partes}
+
+
+def normaliza(texto):
+    """Minúsculas e sem acentos, para comparar textos da pergunta e do banco."""
+    sem_acentos = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return sem_acentos.lower()
+
+
+class ConsultaNotion:
+    """Projeção, filtro e paginação de uma consulta a um banco do Notion."""
+
+    def __init__(self, propriedades=None, filtro=None, tamanho_pagina=TAMANHO_PAGINA):
+        self.propriedades = list(propriedades) if propriedades else None
+        self.filtro = filtro
+        self.tamanho_pagina = max(1, min(int(tamanho_pagina), TAMANHO_PAGINA))
+
+    @classmethod
+    def de_dicionario(cls, dados):
+        return cls(dados.get('propriedades'), dados.get('filtro'), dados.get('tamanho_pagina', TAMANHO_PAGINA))
+
+    def __bool__(self):
+        return bool(self.propriedades or self.filtro)
+
+    def assinatura(self):
+        """Texto estável que identifica a consulta (para saber se a configuração mudou)."""
+        return json.dumps([self.propriedades, self.filtro], sort_keys=True, ensure_ascii=False)
+
+    def combinar(self, outra):
+        """
+        Consulta com os filtros das duas (and). A projeção é a de `outra` (a
+        mais específica), se houver.
+        """
+        if outra is None:
+            return self
+        return ConsultaNotion(
+            outra.propriedades or self.propriedades,
+            e_logico([self.filtro, outra.filtro]),
+            min(self.tamanho_pagina, outra.tamanho_pagina),
+        )
+
+    def parametros(self, esquema=None):
+        """
+        Parâmetros para `databases.query` (sem o id do banco). Nomes de
+        propriedades são trocados pelos ids do esquema, quando conhecidos.
+        """
+        parametros = {}
+        if self.propriedades:
+            esquema = esquema or {}
+            parametros['filter_properties'] = [esquema.get(nome, {}).get('id', nome) for nome in self.propriedades]
+        if self.filtro:
+            parametros['filter'] = self.filtro
+        return parametros
+
+    def aplicar(self, linhas, limite=None):
+        """
+        Aplica a consulta a linhas já lidas (ex.: do espelho local, dicionários
+        com 'propriedades'): propriedades projetadas das linhas que atendem ao
+        filtro, no máximo `limite`.
+        """
+        resultado = []
+        for linha in linhas:
+            propriedades = linha.get('propriedades') or {}
+            if not atende(self.filtro, propriedades):
+                continue
+            if self.propriedades:
+                propriedades = {nome: propriedades[nome] for nome in self.propriedades if nome in propriedades}
+            resultado.append(propriedades)
+            if limite and len(resultado) >= limite:
+                break
+        return resultado
+
+
+
+def atende(filtro, propriedades):
+    """
+    Se uma linha (propriedades no formato da API) atende ao filtro, avaliado
+    localmente. Cobre os filtros montados aqui: and/or, date, select, status,
+    multi_select e checkbox; outros levantam ValueError.
+    """
+    if not filtro:
+        return True
+    if 'and' in filtro:
+        return all(atende(parte, propriedades) for parte in filtro['and'])
+    if 'or' in filtro:
+        return any(atende(parte, propriedades) for parte in filtro['or'])
+    propriedade = propriedades.get(filtro.get('property')) or {}
+    tipo = next((tipo for tipo in ('date', 'select', 'status', 'multi_select', 'checkbox') if tipo in filtro), None)
+    if tipo is None:
+        raise ValueError(f'Filtro não suportado localmente: {filtro}')
+    (operador, esperado), = filtro[tipo].items()
+    valor = propriedade.get(tipo)
+
+    if tipo == 'date':
+        data = ((valor or {}).get('start') or '')[:10]
+        if operador == 'is_empty':
+            return not data
+        if operador == 'is_not_empty':
+            return bool(data)
+        if not data:
+            return False
+        comparacoes = {'equals': data == esperado[:10], 'before': data < esperado[:10],
+                       'after': data > esperado[:10], 'on_or_before': data <= esperado[:10],
+                       'on_or_after': data >= esperado[:10]}
+        if operador in comparacoes:
+            return comparacoes[operador]
+    elif tipo in ('select', 'status'):
+        nome = (valor or {}).get('name')
+        comparacoes = {'equals': nome == esperado, 'does_not_equal': nome != esperado,
+                       'is_empty': nome is None, 'is_not_empty': nome is not None}
+        if operador in comparacoes:
+            return comparacoes[operador]
+    elif tipo == 'multi_select':
+        nomes = [item.get('name') for item in valor or []]
+        comparacoes = {'contains': esperado in nomes, 'does_not_contain': esperado not in nomes,
+                       'is_empty': not nomes, 'is_not_empty': bool(nomes)}
+        if operador in comparacoes:
+            return comparacoes[operador]
+    elif operador in ('equals', 'does_not_equal'):
+        return (bool(valor) == esperado) == (operador == 'equals')
+    raise ValueError(f'Filtro não suportado localmente: {filtro}')
+
+
+def carregar_configuracao(caminho=ARQUIVO_CONSULTAS):
+    """Consultas configuradas por banco ({id do banco: ConsultaNotion}); vazio se não houver arquivo."""
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {id_banco.replace('-', ''): ConsultaNotion.de_dicionario(consulta) for id_banco, consulta in dados.items()}
+
+
+def consulta_configurada(id_banco, caminho=ARQUIVO_CONSULTAS):
+    return carregar_configuracao(caminho).get(id_banco.replace('-', ''))
+
+
+def periodo_da_pergunta(pergunta, hoje=None):
+    """(início, fim) em ISO citado na pergunta, ou None."""
+    texto = normaliza(pergunta)
+    hoje = hoje or datetime.date.today()
+
+    datas = [datetime.date(int(ano), int(mes), int(dia))
+             for dia, mes, ano in re.findall(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', texto)
+             if 1 <= int(mes) <= 12 and 1 <= int(dia) <= calendar.monthrange(int(ano), int(mes))[1]]
+    if datas:
+        return min(datas).isoformat(), max(datas).isoformat()
+
+    # Mês por extenso vale com ano ("março de 2024") ou depois de uma palavra de
+    # contexto ("em março"); mm/aaaa só depois de uma palavra de contexto
+    citados = [encontro.groups() for encontro in
+               re.finditer(r'\b(' + '|'.join(MESES) + r')\b(?:\s+(?:de\s+)?(\d{4})\b)?', texto)
+               if encontro.group(2) or _em_contexto_de_data(texto, encontro.start())]
+    # Mês sem ano usa o ano citado junto ("entre março e maio de 2024") ou o atual
+    ano_padrao = max((int(ano) for _, ano in citados if ano), default=hoje.year)
+    meses = [(int(ano) if ano else ano_padrao, MESES[nome]) for nome, ano in citados]
+    for encontro in re.finditer(r'\b(\d{1,2})/(\d{4})\b', texto):
+        mes, ano = encontro.groups()
+        if 1 <= int(mes) <= 12 and _em_contexto_de_data(texto, encontro.start()):
+            meses.append((int(ano), int(mes)))
+    if meses:
+        (ano_inicio, mes_inicio), (ano_fim, mes_fim) = min(meses), max(meses)
+        ultimo_dia = calendar.monthrange(ano_fim, mes_fim)[1]
+        return (datetime.date(ano_inicio, mes_inicio, 1).isoformat(),
+                datetime.date(ano_fim, mes_fim, ultimo_dia).isoformat())
+
+    anos = [int(encontro.group(1)) for encontro in re.finditer(r'\b((?:19|20)\d{2})\b', texto)
+            if _em_contexto_de_data(texto, encontro.start())]
+    if anos:
+        return f'{min(anos)}-01-01', f'{max(anos)}-12-31'
+    return None
+
+
+def _em_contexto_de_data(texto, inicio):
+    """Se o que vem antes da posição indica uma data ("em", "até", "entre ... e")."""
+    antes = texto[max(0, inicio - 60):inicio]
+    return bool(_CONTEXTO_DATA.search(antes) or _CONTINUACAO_INTERVALO.search(antes))
+
+
+def propriedade_de_data(esquema):
+    datas = [nome for nome, propriedade in esquema.items() if propriedade.get('type') == 'date']
+    for preferida in PREFERENCIA_DATAS:
+        for nome in datas:
+            if preferida in normaliza(nome):
+                return nome
+    return datas[0] if datas else None
+
+
+def _forma_base(palavra):
+    if palavra.endswith(('oes', 'aes')):
+        palavra = palavra[:-3] + 'ao'
+    elif palavra.endswith('s') and len(palavra) > 3:
+        palavra = palavra[:-1]
+    if palavra.endswith(('a', 'o', 'e')) and len(palavra) > 3:
+        palavra = palavra[:-1]
+    return palavra
+
+
+def formas_base(texto):
+    """
+    Palavras sem acento e sem stopwords, sem as flexões de gênero e número
+    ("adiadas" e "Adiado", "sessões" e "Sessão" coincidem). Mais estrito que o
+    radical do BM25, com o qual "marco" casaria com "Marcada".
+    """
+    return [_forma_base(palavra) for palavra in re.findall(r'\w+', normaliza(texto))
+            if palavra not in stopwords() and (len(palavra) > 1 or palavra.isdigit())]
+
+
+def cita(termos_pergunta, termo):
+    """Se todas as palavras (ver formas_base) de `termo` aparecem na pergunta."""
+    termos = set(formas_base(termo))
+    return bool(termos) and termos <= termos_pergunta
+
+
+def consulta_da_pergunta(pergunta, esquema, hoje=None):
+    """
+    Consulta derivada da pergunta, a partir do esquema do banco
+    (`databases.retrieve(...)['properties']`). Retorna None se a pergunta não
+    citar período nem valores de select/status: sem filtro, não há o que
+    restringir. Propriedades citadas pelo nome entram só na projeção.
+    """
+    termos = set(formas_base(pergunta))
+    filtros, citadas = [], []
+
+    periodo = periodo_da_pergunta(pergunta, hoje)
+    propriedade_data = propriedade_de_data(esquema) if periodo else None
+    if propriedade_data:
+        filtros.append({'and': [
+            {'property': propriedade_data, 'date': {'on_or_after': periodo[0]}},
+            {'property': propriedade_data, 'date': {'on_or_before': periodo[1]}},
+        ]})
+        citadas.append(propriedade_data)
+
+    for nome, propriedade in esquema.items():
+        tipo = propriedade.get('type')
+        if tipo in ('select', 'status', 'multi_select'):
+            opcoes = [opcao['name'] for opcao in propriedade.get(tipo, {}).get('options', []) if opcao.get('name')]
+            valores = [opcao for opcao in opcoes if cita(termos, opcao)]
+            if valores:
+                operador = 'contains' if tipo == 'multi_select' else 'equals'
+                condicoes = [{'property': nome, tipo: {operador: valor}} for valor in valores]
+                filtros.append(condicoes[0] if len(condicoes) == 1 else {'or': condicoes})
+                citadas.append(nome)
+        if cita(termos, nome) and nome not in citadas:
+            citadas.append(nome)
+
+    if not filtros:
+        return None
+    titulo = next((nome for nome, propriedade in esquema.items() if propriedade.get('type') == 'title'), None)
+    # Projeção só quando a pergunta cita o nome de alguma propriedade
+    projecao = None
+    if any(cita(termos, nome) for nome in citadas):
+        projecao = list(dict.fromkeys([nome for nome in [titulo, *citadas] if nome]))
+    return ConsultaNotion(projecao, e_logico(filtros))
@@ -0,0 +1,263 @@
+"""
+Espelho local (SQLite) de páginas e bancos de dados do Notion.
+
+Na primeira sincronização de um banco, todas as linhas são copiadas. Nas
+seguintes, só são pedidas à API as linhas com `last_edited_time` igual ou
+posterior à marca d'água salva (o Notion arredonda esse campo ao minuto, então
+a fronteira é pedida de novo e regravada sem efeito). Linhas apagadas ou
+arquivadas não aparecem nessas consultas: uma varredura periódica lista apenas
+os ids das linhas (filter_properties=['title']) e marca como removidas as que
+sumiram. Páginas avulsas só são relidas (por inteiro, ver notion_blocos) quando
+o seu `last_edited_time` muda ou na varredura periódica.
+
+O chat lê o texto direto do espelho; a API só é consultada se a última
+sincronização for mais antiga que JURIA_NOTION_INTERVALO segundos.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from notion_blocos import paginar, texto_pagina, texto_rico
+from notion_consulta import ConsultaNotion, consulta_configurada
+
+
+CAMINHO_BANCO = os.path.join(os.getenv('JURIA_CACHE_DIR', '.cache'), 'notion.db')
+INTERVALO_SINCRONIZACAO = float(os.getenv('JURIA_NOTION_INTERVALO', '60'))  # segundos
+INTERVALO_VARREDURA = float(os.getenv('JURIA_NOTION_VARREDURA_HORAS', '24')) * 3600
+CAMPOS_FONTE = ('tipo', 'marca_dagua', 'sincronizado_em', 'varrido_em', 'esquema', 'consulta')
+
+_trava = threading.Lock()
+
+
+def texto_propriedades(properties):
+    """Uma linha de banco de dados como texto 'Propriedade: valor | ...'."""
+    row_content = []
+    for prop_name, prop_data in properties.items():
+        prop_type = prop_data.get('type')
+
+        if prop_type in ('title', 'rich_text'):
+            texto = texto_rico(prop_data.get(prop_type))
+            if texto:
+                row_content.append(f"{prop_name}: {texto}")
+
+        elif prop_type == 'number':
+            number = prop_data.get('number')
+            if number is not None:
+                row_content.append(f"{prop_name}: {number}")
+
+        elif prop_type == 'select':
+            select = prop_data.get('select') or {}
+            if select.get('name'):
+                row_content.append(f"{prop_name}: {select.get('name')}")
+
+        elif prop_type == 'multi_select':
+            values = [item.get('name', '') for item in prop_data.get('multi_select') or [] if item.get('name')]
+            if values:
+                row_content.append(f"{prop_name}: {', '.join(values)}")
+
+        elif prop_type == 'date':
+            date = prop_data.get('date') or {}
+            if date.get('start'):
+                date_text = date.get('start')
+                if date.get('end'):
+                    date_text += f" - {date.get('end')}"
+                row_content.append(f"{prop_name}: {date_text}")
+
+        elif prop_type == 'checkbox':
+            checkbox = prop_data.get('checkbox')
+            if checkbox is not None:
+                row_content.append(f"{prop_name}: {'Sim' if checkbox else 'Não'}")
+    return ' | '.join(row_content)
+
+
+def _conectar(caminho=CAMINHO_BANCO):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fontes (
+            id_fonte TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            marca_dagua TEXT,
+            sincronizado_em REAL,
+            varrido_em REAL,
+            esquema TEXT,
+            consulta TEXT
+        )
+    ''')
+    # Espelhos criados antes das consultas configuráveis
+    colunas = {linha[1] for linha in conn.execute('PRAGMA table_info(fontes)')}
+    for coluna in ('esquema', 'consulta'):
+        if coluna not in colunas:
+            conn.execute(f'ALTER TABLE fontes ADD COLUMN {coluna} TEXT')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS linhas (
+            id_fonte TEXT NOT NULL,
+            id_pagina TEXT NOT NULL,
+            criado_em TEXT,
+            editado_em TEXT,
+            propriedades TEXT,
+            texto TEXT NOT NULL,
+            removida INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (id_fonte, id_pagina)
+        )
+    ''')
+    return conn
+
+
+class EspelhoNotion:
+    """Cópia local, sincronizada incrementalmente, de páginas e bancos do Notion."""
+
+    def __init__(self, caminho=CAMINHO_BANCO):
+        self.caminho = caminho
+
+    def _executar(self, funcao):
+        with _trava:
+            conn = _conectar(self.caminho)
+            try:
+                with conn:
+                    return funcao(conn)
+            finally:
+                conn.close()
+
+    def fonte(self, id_fonte):
+        """
+        Estado da fonte no espelho ({'tipo', 'marca_dagua', 'sincronizado_em',
+        'varrido_em', 'esquema', 'consulta'}) ou None.
+        """
+        linha = self._executar(lambda conn: conn.execute(
+            f'SELECT {", ".join(CAMPOS_FONTE)} FROM fontes WHERE id_fonte = ?', (id_fonte,)).fetchone())
+        if linha is None:
+            return None
+        estado = dict(zip(CAMPOS_FONTE, linha))
+        estado['esquema'] = json.loads(estado['esquema']) if estado['esquema'] else None
+        return estado
+
+    def esquema(self, id_fonte):
+        """Propriedades do banco (`databases.retrieve(...)['properties']`) salvas na sincronização, ou None."""
+        estado = self.fonte(id_fonte)
+        return estado['esquema'] if estado else None
+
+    def sincronizar(self, notion, id_fonte, tipo, forcar=False, consulta=None):
+        """
+        Atualiza o espelho da fonte ('pagina' ou 'banco') a partir da API.
+        Retorna {'alteradas', 'removidas'}; sem chamadas à API se a última
+        sincronização for recente e `forcar` for falso.
+
+        Para bancos, `consulta` (padrão: a configurada em notion_consulta)
+        limita as linhas e propriedades espelhadas; se ela mudar, o banco é
+        copiado de novo.
+        """
+        estado = self.fonte(id_fonte) or {**dict.fromkeys(CAMPOS_FONTE), 'tipo': tipo}
+        agora = time.time()
+        if not forcar and estado['sincronizado_em'] and agora - estado['sincronizado_em'] < INTERVALO_SINCRONIZACAO:
+            return {'alteradas': 0, 'removidas': 0}
+        if tipo == 'banco':
+            if consulta is None:
+                consulta = consulta_configurada(id_fonte)
+            return self._sincronizar_banco(notion, id_fonte, estado, agora, consulta or ConsultaNotion())
+        return self._sincronizar_pagina(notion, id_fonte, estado, agora)
+
+    def _sincronizar_pagina(self, notion, id_fonte, estado, agora):
+        pagina = notion.pages.retrieve(page_id=id_fonte)
+        editado_em = pagina.get('last_edited_time')
+        # Editar uma subpágina não muda o last_edited_time da página de cima:
+        # a árvore inteira também é relida periodicamente
+        varrido_em = estado['varrido_em']
+        alterada = editado_em != estado['marca_dagua'] or not varrido_em or agora - varrido_em >= INTERVALO_VARREDURA
+        linhas = []
+        if alterada:
+            texto = texto_pagina(notion.options.auth, id_fonte)
+            linhas.append((id_fonte, id_fonte, pagina.get('created_time'), editado_em, None, texto, 0))
+            varrido_em = agora
+        self._gravar(id_fonte, linhas, [], {**estado, 'tipo': 'pagina', 'marca_dagua': editado_em,
+                                            'sincronizado_em': agora, 'varrido_em': varrido_em})
+        return {'alteradas': int(alterada), 'removidas': 0}
+
+    def _sincronizar_banco(self, notion, id_fonte, estado, agora, consulta):
+        # Consulta configurada diferente da usada no espelho: copia tudo de novo
+        assinatura = consulta.assinatura()
+        recopiar = assinatura != estado['consulta']
+        marca = None if recopiar else estado['marca_dagua']
+        varrido_em = None if recopiar else estado['varrido_em']
+        varredura = marca and (not varrido_em or agora - varrido_em >= INTERVALO_VARREDURA)
+
+        esquema = estado['esquema']
+        if esquema is None or recopiar or varredura:
+            esquema = notion.databases.retrieve(database_id=id_fonte).get('properties', {})
+
+        incremental = None
+        if marca:
+            incremental = ConsultaNotion(filtro={'timestamp': 'last_edited_time',
+                                                 'last_edited_time': {'on_or_after': marca}})
+        parametros = consulta.combinar(incremental).parametros(esquema)
+        # Ordem de edição só para a sincronização; a leitura segue a ordem de criação
+        parametros['sorts'] = [{'timestamp': 'last_edited_time', 'direction': 'ascending'}]
+
+        linhas, removidas = [], []
+        for entrada in paginar(notion.databases.query, tamanho_pagina=consulta.tamanho_pagina,
+                               database_id=id_fonte, **parametros):
+            editado_em = entrada.get('last_edited_time')
+            marca = max(marca or editado_em, editado_em)
+            if entrada.get('archived') or entrada.get('in_trash'):
+                removidas.append(entrada['id'])
+                continue
+            propriedades = entrada.get('properties', {})
+            linhas.append((id_fonte, entrada['id'], entrada.get('created_time'), editado_em,
+                           json.dumps(propriedades, ensure_ascii=False), texto_propriedades(propriedades), 0))
+
+        # A primeira sincronização já é completa; depois, a varredura é periódica.
+        # Linhas que deixaram de atender ao filtro configurado também saem do espelho
+        if varredura:
+            ids = ConsultaNotion(['title'], consulta.filtro).parametros()
+            existentes = {entrada['id'] for entrada in paginar(notion.databases.query, database_id=id_fonte, **ids)}
+            removidas.extend(set(self._ids_ativos(id_fonte)) - existentes - {linha[1] for linha in linhas})
+        if varredura or not estado['marca_dagua'] or recopiar:
+            varrido_em = agora
+
+        self._gravar(id_fonte, linhas, removidas, {
+            **estado, 'tipo': 'banco', 'marca_dagua': marca, 'sincronizado_em': agora, 'varrido_em': varrido_em,
+            'esquema': esquema, 'consulta': assinatura,
+        }, recopiar=recopiar)
+        return {'alteradas': len(linhas), 'removidas': len(removidas)}
+
+    def _ids_ativos(self, id_fonte):
+        return [linha[0] for linha in self._executar(lambda conn: conn.execute(
+            'SELECT id_pagina FROM linhas WHERE id_fonte = ? AND removida = 0', (id_fonte,)).fetchall())]
+
+    def _gravar(self, id_fonte, linhas, removidas, estado, recopiar=False):
+        def gravar(conn):
+            if recopiar:
+                conn.execute('DELETE FROM linhas WHERE id_fonte = ?', (id_fonte,))
+            conn.executemany('''
+                INSERT OR REPLACE INTO linhas (id_fonte, id_pagina, criado_em, editado_em, propriedades, texto, removida)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', linhas)
+            conn.executemany('UPDATE linhas SET removida = 1 WHERE id_fonte = ? AND id_pagina = ?',
+                             [(id_fonte, id_pagina) for id_pagina in removidas])
+            valores = {**estado, 'esquema': json.dumps(estado['esquema'], ensure_ascii=False)
+                       if estado.get('esquema') is not None else None}
+            conn.execute(f'''
+                INSERT OR REPLACE INTO fontes (id_fonte, {", ".join(CAMPOS_FONTE)})
+                VALUES (?{", ?" * len(CAMPOS_FONTE)})
+            ''', (id_fonte, *(valores.get(campo) for campo in CAMPOS_FONTE)))
+        self._executar(gravar)
+
+    def linhas(self, id_fonte):
+        """Linhas ativas da fonte, em ordem de criação: dicionários {'id', 'propriedades', 'texto'}."""
+        resultado = self._executar(lambda conn: conn.execute('''
+            SELECT id_pagina, propriedades, texto FROM linhas
+            WHERE id_fonte = ? AND removida = 0 ORDER BY criado_em, id_pagina
+        ''', (id_fonte,)).fetchall())
+        return [{'id': id_pagina, 'propriedades': json.loads(propriedades) if propriedades else None, 'texto': texto}
+                for id_pagina, propriedades, texto in resultado]
+
+    def texto(self, id_fonte):
+        """Texto da fonte, montado a partir do espelho."""
+        textos = self._executar(lambda conn: conn.execute('''
+            SELECT texto FROM linhas
+            WHERE id_fonte = ? AND removida = 0 AND texto != '' ORDER BY criado_em, id_pagina
+        ''', (id_fonte,)).fetchall())
+        return '\n\n'.join(texto for texto, in textos)
@@ -0,0 +1,179 @@
+"""
+Camada de requisições ao Notion com controle de taxa compartilhado.
+
+O Notion aceita em média ~3 requisições por segundo por integração e responde
+429 (com Retry-After) quando o limite é passado. Todas as requisições do
+processo — de todas as sessões do Streamlit e de todos os workers assíncronos —
+passam pelo mesmo LimitadorNotion:
+
+  - um balde de tokens com a taxa da API e uma pequena rajada;
+  - ao receber 429, uma pausa global até o fim do Retry-After, respeitada por
+    todos os workers, e redução da taxa pela metade (backoff adaptativo);
+  - a taxa volta a subir aos poucos a cada sequência de respostas sem 429;
+  - métricas de requisições, 429s, novas tentativas e tempo de espera.
+
+ClienteNotion e ClienteNotionAsync são o Client e o AsyncClient do notion_client
+com essa camada no método `request`, usado por todos os endpoints.
+"""
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+
+
+TAXA_NOTION = float(os.getenv('JURIA_NOTION_TAXA', '3'))  # requisições por segundo
+RAJADA = 3
+TAXA_MINIMA = 0.5
+SUCESSOS_PARA_SUBIR = 20  # respostas seguidas sem 429 para aumentar a taxa
+PASSO_SUBIDA = 0.25
+TENTATIVAS = 5
+ESPERA_PADRAO_429 = 1.0  # segundos, se a resposta não trouxer Retry-After
+STATUS_TEMPORARIOS = {429, 500, 502, 503, 504}
+
+
+def _retry_after(erro):
+    try:
+        return float(erro.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class LimitadorNotion:
+    """Balde de tokens com pausa global e taxa adaptativa, seguro entre threads."""
+
+    def __init__(self, taxa=TAXA_NOTION, rajada=RAJADA):
+        self.taxa_maxima = taxa
+        self.taxa = taxa
+        self.rajada = rajada
+        self._tokens = float(rajada)
+        self._atualizado_em = time.monotonic()
+        self._pausa_ate = 0.0
+        self._sucessos = 0
+        self._trava = threading.Lock()
+        self.metricas = {'requisicoes': 0, 'limitadas': 0, 'novas_tentativas': 0, 'erros': 0, 'espera_total': 0.0}
+
+    def reservar(self):
+        """
+        Reserva a próxima vaga e retorna quantos segundos esperar antes de usá-la.
+        As reservas são feitas em ordem: o saldo pode ficar negativo, e cada
+        chamador espera a sua vez sem segurar a trava.
+        """
+        with self._trava:
+            agora = time.monotonic()
+            # Durante uma pausa, _atualizado_em fica no futuro e não há reposição
+            self._tokens = min(self.rajada, self._tokens + max(0.0, agora - self._atualizado_em) * self.taxa)
+            self._atualizado_em = max(agora, self._atualizado_em)
+            self._tokens -= 1
+            # O déficit de tokens é pago a partir do fim da pausa, não em paralelo a ela
+            espera = max(0.0, self._atualizado_em - agora - self._tokens / self.taxa, self._pausa_ate - agora)
+            self.metricas['requisicoes'] += 1
+            self.metricas['espera_total'] += espera
+            return espera
+
+    def aguardar(self):
+        espera = self.reservar()
+        if espera:
+            time.sleep(espera)
+
+    async def aguardar_async(self):
+        espera = self.reservar()
+        if espera:
+            await asyncio.sleep(espera)
+
+    def registrar_sucesso(self):
+        with self._trava:
+            self._sucessos += 1
+            if self._sucessos >= SUCESSOS_PARA_SUBIR and self.taxa < self.taxa_maxima:
+                self.taxa = min(self.taxa_maxima, self.taxa + PASSO_SUBIDA)
+                self._sucessos = 0
+
+    def registrar_falha(self, erro, tentativa):
+        """
+        Registra uma falha temporária e retorna quanto esperar antes de tentar
+        de novo. Em 429, pausa todos os workers até o fim do Retry-After e reduz
+        a taxa; a espera já fica embutida na próxima reserva.
+        """
+        with self._trava:
+            self.metricas['novas_tentativas'] += 1
+            if getattr(erro, 'status', None) != 429:
+                self.metricas['erros'] += 1
+                return min(30.0, 2 ** tentativa)
+            retry_after = _retry_after(erro)
+            self.metricas['limitadas'] += 1
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + (retry_after or ESPERA_PADRAO_429))
+            self.taxa = max(TAXA_MINIMA, self.taxa / 2)
+            # Descarta a rajada acumulada e só volta a repor ao fim da pausa
+            self._tokens = min(self._tokens, 0.0)
+            self._atualizado_em = max(self._atualizado_em, self._pausa_ate)
+            self._sucessos = 0
+            return 0.0
+
+    def resumo(self):
+        with self._trava:
+            return {**self.metricas, 'taxa_atual': self.taxa}
+
+
+LIMITADOR = LimitadorNotion()
+
+
+def _temporario(erro):
+    from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+    if isinstance(erro, RequestTimeoutError):
+        return True
+    return isinstance(erro, HTTPResponseError) and erro.status in STATUS_TEMPORARIOS
+
+
+@lru_cache(maxsize=None)
+def _classes_limitadas():
+    """Subclasses de Client e AsyncClient do notion_client que passam pelo limitador."""
+    from notion_client import AsyncClient, Client
+
+    class ClienteLimitado(Client):
+        def __init__(self, *args, limitador=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.limitador = limitador or LIMITADOR
+
+        def request(self, *args, **kwargs):
+            for tentativa in range(TENTATIVAS):
+                self.limitador.aguardar()
+                try:
+                    resposta = super().request(*args, **kwargs)
+                except Exception as erro:
+                    if not _temporario(erro) or tentativa == TENTATIVAS - 1:
+                        raise
+                    time.sleep(self.limitador.registrar_falha(erro, tentativa))
+                    continue
+                self.limitador.registrar_sucesso()
+                return resposta
+
+    class ClienteLimitadoAsync(AsyncClient):
+        def __init__(self, *args, limitador=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.limitador = limitador or LIMITADOR
+
+        async def request(self, *args, **kwargs):
+            for tentativa in range(TENTATIVAS):
+                await self.limitador.aguardar_async()
+                try:
+                    resposta = await super().request(*args, **kwargs)
+                except Exception as erro:
+                    if not _temporario(erro) or tentativa == TENTATIVAS - 1:
+                        raise
+                    await asyncio.sleep(self.limitador.registrar_falha(erro, tentativa))
+                    continue
+                self.limitador.registrar_sucesso()
+                return resposta
+
+    return ClienteLimitado, ClienteLimitadoAsync
+
+
+def ClienteNotion(*args, **kwargs):
+    """notion_client.Client com controle de taxa (ver LimitadorNotion)."""
+    return _classes_limitadas()[0](*args, **kwargs)
+
+
+def ClienteNotionAsync(*args, **kwargs):
+    """notion_client.AsyncClient com controle de taxa (ver LimitadorNotion)."""
+    return _classes_limitadas()[1](*args, **kwargs)
@@ -0,0 +1,275 @@
+"""
+Bancos do Notion como tabelas tipadas e respostas exatas a perguntas estruturadas.
+
+As linhas do espelho local (notion_espelho) viram um DataFrame com uma coluna
+por propriedade, já convertida para o tipo certo: texto (title, rich_text),
+número, categoria (select, status), lista de valores (multi_select), data e
+booleano (checkbox). Sobre essa tabela, consulta_tabela responde por regras
+perguntas de contagem, filtro e agregação ("quantas sessões do júri estão
+marcadas para novembro?", "média do valor por comarca") com pandas, e só a
+pequena tabela de resultado vai para o modelo redigir a resposta.
+
+Regras reconhecidas (sem acentos, em minúsculas):
+  - filtros: período citado (ver notion_consulta.periodo_da_pergunta) sobre a
+    propriedade de data preferida; valores de select/status/multi_select
+    citados; propriedades checkbox citadas ("sem"/"não" antes do nome negam);
+  - operação: "quantos/quantas/quantidade/número de/total de" contam; "soma",
+    "total", "média", "maior/máximo", "menor/mínimo" seguidos de uma
+    propriedade numérica agregam; "por <propriedade>" (ou "por mês"/"por ano")
+    agrupa; só com filtros, lista as linhas encontradas.
+"""
+import datetime
+import re
+
+import pandas as pd
+
+from notion_blocos import texto_rico
+from notion_consulta import cita, formas_base, normaliza, periodo_da_pergunta, propriedade_de_data
+
+
+TIPOS_COLUNA = {
+    'title': 'string', 'rich_text': 'string', 'number': 'Float64', 'select': 'category',
+    'status': 'category', 'multi_select': 'object', 'date': 'datetime64[ns]', 'checkbox': 'boolean',
+}
+TIPOS_CATEGORIA = ('select', 'status', 'multi_select')
+LIMITE_LINHAS_RESULTADO = 30
+
+PADRAO_CONTAGEM = re.compile(r'\b(?:quant[oa]s|quantidade|numero de|total de)\b')
+AGREGACOES = {
+    'soma': (r'soma|somatorio|total', 'sum'),
+    'média': (r'media', 'mean'),
+    'máximo': (r'maior|maxim[oa]', 'max'),
+    'mínimo': (r'menor|minim[oa]', 'min'),
+}
+PERIODOS_GRUPO = {'mes': 'M', 'ano': 'Y'}
+
+
+def _data(valor):
+    """Início de uma data do Notion ('2024-11-05' ou com hora e fuso) como datetime local, sem fuso."""
+    if not valor:
+        return None
+    return datetime.datetime.fromisoformat(valor.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def valor_propriedade(propriedade):
+    """Valor Python de uma propriedade de linha do Notion, conforme o tipo; None se vazia."""
+    tipo = propriedade.get('type')
+    dados = propriedade.get(tipo)
+    if tipo in ('title', 'rich_text'):
+        return texto_rico(dados) or None
+    if tipo in ('select', 'status'):
+        return (dados or {}).get('name')
+    if tipo == 'multi_select':
+        return [item['name'] for item in dados or [] if item.get('name')]
+    if tipo == 'date':
+        return _data((dados or {}).get('start'))
+    return dados
+
+
+def tabela_notion(linhas, esquema=None):
+    """
+    DataFrame tipado das linhas do espelho ({'id', 'propriedades', ...}),
+    indexado pelo id da página. `esquema` (propriedades do banco) garante as
+    colunas mesmo sem valores; `tabela.attrs['tipos']` guarda o tipo do Notion
+    de cada coluna.
+    """
+    tipos = {nome: propriedade.get('type') for nome, propriedade in (esquema or {}).items()}
+    for linha in linhas:
+        for nome, propriedade in (linha['propriedades'] or {}).items():
+            tipos.setdefault(nome, propriedade.get('type'))
+    tipos = {nome: tipo for nome, tipo in tipos.items() if tipo in TIPOS_COLUNA}
+
+    dados = {nome: [] for nome in tipos}
+    for linha in linhas:
+        propriedades = linha['propriedades'] or {}
+        for nome, tipo in tipos.items():
+            propriedade = propriedades.get(nome)
+            valor = valor_propriedade(propriedade) if propriedade and propriedade.get('type') == tipo else None
+            dados[nome].append([] if tipo == 'multi_select' and valor is None else valor)
+
+    tabela = pd.DataFrame({nome: pd.Series(valores, dtype=TIPOS_COLUNA[tipos[nome]])
+                           for nome, valores in dados.items()})
+    tabela.index = pd.Index([linha['id'] for linha in linhas], name='id')
+    tabela.attrs['tipos'] = tipos
+    return tabela
+
+
+def _opcoes(tabela, nome, tipo):
+    if tipo == 'multi_select':
+        return sorted({valor for valores in tabela[nome] for valor in valores})
+    return [valor for valor in tabela[nome].dropna().unique()]
+
+
+def _filtros(pergunta, tabela, hoje):
+    """Filtros citados na pergunta: lista de (descrição, máscara booleana, coluna)."""
+    texto, termos = normaliza(pergunta), set(formas_base(pergunta))
+    tipos = tabela.attrs['tipos']
+    filtros = []
+
+    periodo = periodo_da_pergunta(pergunta, hoje)
+    coluna_data = propriedade_de_data({nome: {'type': tipo} for nome, tipo in tipos.items()}) if periodo else None
+    if coluna_data:
+        inicio = pd.Timestamp(periodo[0])
+        fim = pd.Timestamp(periodo[1]) + pd.Timedelta(days=1)
+        mascara = (tabela[coluna_data] >= inicio) & (tabela[coluna_data] < fim)
+        filtros.append((f'{coluna_data} entre {periodo[0]} e {periodo[1]}', mascara.fillna(False), coluna_data))
+
+    for nome, tipo in tipos.items():
+        if tipo in TIPOS_CATEGORIA:
+            valores = [valor for valor in _opcoes(tabela, nome, tipo) if cita(termos, valor)]
+            if not valores:
+                continue
+            if tipo == 'multi_select':
+                mascara = tabela[nome].map(lambda itens: any(valor in itens for valor in valores)).astype(bool)
+            else:
+                mascara = tabela[nome].isin(valores)
+            filtros.append((f"{nome} em {', '.join(valores)}", mascara, nome))
+        elif tipo == 'checkbox' and cita(termos, nome):
+            negado = re.search(r'\b(?:sem|nao)\s+(?:\w+\s+)?' + re.escape(normaliza(nome)), texto) is not None
+            filtros.append((f"{nome} = {'Não' if negado else 'Sim'}",
+                            (tabela[nome] == (not negado)).fillna(False), nome))
+    return filtros
+
+
+def _agregacao(texto, termos, tabela):
+    """(rótulo, função pandas, coluna numérica) pedida na pergunta, ou None."""
+    numericas = [nome for nome, tipo in tabela.attrs['tipos'].items() if tipo == 'number' and cita(termos, nome)]
+    if not numericas:
+        return None
+    for rotulo, (padrao, funcao) in AGREGACOES.items():
+        if re.search(r'\b(?:' + padrao + r')\b', texto):
+            return rotulo, funcao, numericas[0]
+    return None
+
+
+def _agrupamento(texto, tabela):
+    """Coluna (ou (coluna de data, período)) citada depois de 'por', ou None."""
+    tipos = tabela.attrs['tipos']
+    for trecho in re.findall(r'\bpor\s+((?:\w+\s*){1,4})', texto):
+        termos = set(formas_base(trecho))
+        palavras = trecho.split()
+        if palavras and palavras[0] in PERIODOS_GRUPO:
+            coluna = propriedade_de_data({nome: {'type': tipo} for nome, tipo in tipos.items()})
+            if coluna:
+                return coluna, PERIODOS_GRUPO[palavras[0]]
+        for nome, tipo in tipos.items():
+            if tipo in (*TIPOS_CATEGORIA, 'checkbox') and cita(termos, nome):
+                return nome, None
+    return None
+
+
+def _agrupar(tabela, grupo):
+    """
+    (linhas, chaves) para agrupar: multi_select vira uma linha por valor, com as
+    demais colunas repetidas, para que chaves e valores fiquem alinhados.
+    """
+    coluna, periodo = grupo
+    if periodo:
+        return tabela, tabela[coluna].dt.to_period(periodo).astype('string')
+    if tabela.attrs['tipos'][coluna] == 'multi_select':
+        tabela = tabela.explode(coluna).reset_index(drop=True)
+        return tabela, tabela[coluna].astype('string')
+    return tabela, tabela[coluna].astype('string')
+
+
+def cita_banco(pergunta, tabela):
+    """
+    Se a pergunta se refere ao banco: cita o nome de uma propriedade ou um
+    valor de select/status/multi_select. Só período ou palavras de contagem
+    não bastam ("quantas testemunhas podem ser arroladas?").
+    """
+    termos = set(formas_base(pergunta))
+    for nome, tipo in tabela.attrs.get('tipos', {}).items():
+        if cita(termos, nome):
+            return True
+        if tipo in TIPOS_CATEGORIA and any(cita(termos, valor) for valor in _opcoes(tabela, nome, tipo)):
+            return True
+    return False
+
+
+def _formata(tabela):
+    """Cópia para exibição: listas juntadas e datas sem hora quando não há hora."""
+    saida = tabela.copy()
+    for nome in saida.columns:
+        coluna = saida[nome]
+        if pd.api.types.is_datetime64_any_dtype(coluna):
+            formato = '%Y-%m-%d' if (coluna.dropna() == coluna.dropna().dt.normalize()).all() else '%Y-%m-%d %H:%M'
+            saida[nome] = coluna.dt.strftime(formato)
+        elif coluna.dtype == object:
+            saida[nome] = coluna.map(lambda valor: ', '.join(valor) if isinstance(valor, list) else valor)
+    return saida
+
+
+def consulta_tabela(pergunta, tabela, hoje=None):
+    """
+    Resposta exata à pergunta sobre a tabela: {'operacao', 'filtros', 'total',
+    'resultado', 'cita_banco'}, com `resultado` já pequeno (no máximo
+    LIMITE_LINHAS_RESULTADO linhas) e `cita_banco` indicando se a pergunta se
+    refere ao banco (ver cita_banco). Retorna None se a pergunta não tiver
+    filtros nem operação reconhecidos, ou se não citar o banco nem tiver
+    filtros (uma contagem sobre outro assunto), para seguir pela busca normal.
+    """
+    if tabela.empty or not tabela.attrs.get('tipos'):
+        return None
+    texto, termos = normaliza(pergunta), set(formas_base(pergunta))
+    filtros = _filtros(pergunta, tabela, hoje)
+    agregacao = _agregacao(texto, termos, tabela)
+    grupo = _agrupamento(texto, tabela)
+    contagem = PADRAO_CONTAGEM.search(texto) is not None
+    if not (filtros or agregacao or grupo or contagem):
+        return None
+    citado = cita_banco(pergunta, tabela)
+    if not citado and not filtros:
+        return None
+
+    selecao = tabela
+    for _, mascara, _ in filtros:
+        selecao = selecao[mascara.loc[selecao.index]]
+    descricoes = [descricao for descricao, _, _ in filtros]
+
+    if agregacao:
+        rotulo, funcao, coluna = agregacao
+        nome_resultado = f'{rotulo} de {coluna}'
+        if grupo:
+            linhas, chaves = _agrupar(selecao, grupo)
+            resultado = linhas[coluna].groupby(chaves).agg(funcao).rename(nome_resultado).reset_index()
+            resultado.columns = [grupo[0], nome_resultado]
+        else:
+            resultado = pd.DataFrame({nome_resultado: [selecao[coluna].agg(funcao)],
+                                      'linhas consideradas': [int(selecao[coluna].notna().sum())]})
+        operacao = nome_resultado
+    elif grupo:
+        _, chaves = _agrupar(selecao, grupo)
+        resultado = chaves.value_counts().rename('quantidade').reset_index()
+        resultado.columns = [grupo[0], 'quantidade']
+        operacao = f'contagem por {grupo[0]}'
+    elif contagem or not filtros:
+        resultado = pd.DataFrame({'quantidade': [len(selecao)]})
+        operacao = 'contagem'
+    else:
+        tipos = tabela.attrs['tipos']
+        titulo = [nome for nome, tipo in tipos.items() if tipo == 'title']
+        citadas = [nome for nome in tipos if cita(termos, nome)]
+        colunas = list(dict.fromkeys(titulo + [coluna for _, _, coluna in filtros] + citadas))
+        resultado = selecao[colunas]
+        operacao = 'listagem'
+
+    return {
+        'operacao': operacao,
+        'filtros': descricoes,
+        'total': len(selecao),
+        'resultado': _formata(resultado.head(LIMITE_LINHAS_RESULTADO)),
+        'cita_banco': citado,
+    }
+
+
+def texto_resultado(resposta, total_banco):
+    """Resultado de consulta_tabela como texto para o prompt."""
+    linhas = [f'Resultado exato calculado sobre as {total_banco} linhas do banco ({resposta["operacao"]}).']
+    if resposta['filtros']:
+        linhas.append('Filtros: ' + '; '.join(resposta['filtros']) + f' ({resposta["total"]} linha(s) atendem).')
+    resultado = resposta['resultado']
+    if resposta['operacao'] == 'listagem' and resposta['total'] > len(resultado):
+        linhas.append(f'Mostrando {len(resultado)} de {resposta["total"]} linhas.')
+    linhas.append(resultado.to_string(index=False))
+    return '\n'.join(linhas)
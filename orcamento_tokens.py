@@ -0,0 +1,144 @@
+"""
+Orçamento de tokens para a montagem do prompt.
+
+Conta tokens com os codificadores do tiktoken (carregados uma vez por modelo)
+e distribui o orçamento entre instruções, trechos do documento, histórico e
+pergunta com prioridades fixas:
+
+1. instruções do sistema e pergunta do usuário (sempre enviadas);
+2. trechos do documento, na ordem de relevância, até a fração reservada ao contexto;
+3. histórico da conversa, das mensagens mais recentes para as mais antigas;
+4. trechos restantes, se ainda sobrar espaço.
+
+O mesmo conjunto de entradas sempre produz o mesmo prompt.
+"""
+import os
+from functools import lru_cache
+
+
+ORCAMENTO_PADRAO = int(os.getenv('JURIA_ORCAMENTO_TOKENS', '16000'))
+RESERVA_RESPOSTA = 4096
+FRACAO_CONTEXTO = 0.6
+TOKENS_POR_MENSAGEM = 4  # marcações de papel/início/fim de cada mensagem de chat
+JANELA_PADRAO = 128000
+
+
+@lru_cache(maxsize=None)
+def codificador(modelo):
+    """Codificador tiktoken do modelo; modelos de outros provedores usam o o200k_base como aproximação."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(modelo)
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception:
+        # Sem rede para baixar as tabelas BPE: usa a estimativa por caracteres
+        return None
+
+
+@lru_cache(maxsize=50_000)
+def conta_tokens(texto, modelo):
+    """Número de tokens de um texto para o modelo informado."""
+    if not texto:
+        return 0
+    enc = codificador(modelo)
+    if enc is None:
+        return len(texto) // 4 + 1
+    return len(enc.encode(texto, disallowed_special=()))
+
+
+def trunca_tokens(texto, limite, modelo):
+    """Corta o texto para caber em `limite` tokens, mantendo o início."""
+    if limite <= 0:
+        return ''
+    enc = codificador(modelo)
+    if enc is None:
+        return texto[:limite * 4]
+    tokens = enc.encode(texto, disallowed_special=())
+    if len(tokens) <= limite:
+        return texto
+    return enc.decode(tokens[:limite])
+
+
+class OrcamentoPrompt:
+    """Ajusta trechos, histórico e pergunta ao orçamento de tokens de um modelo."""
+
+    def __init__(self, modelo, janela=JANELA_PADRAO, orcamento=ORCAMENTO_PADRAO,
+                 reserva_resposta=RESERVA_RESPOSTA, fracao_contexto=FRACAO_CONTEXTO):
+        self.modelo = modelo
+        self.janela = janela
+        self.limite = max(0, min(orcamento, janela - reserva_resposta))
+        self.fracao_contexto = fracao_contexto
+
+    def conta(self, texto):
+        return conta_tokens(texto, self.modelo)
+
+    def ajustar(self, sistema, trechos, historico, pergunta):
+        """
+        Seleciona o que cabe no orçamento.
+
+        Retorna (trechos, historico, pergunta, uso), em que `uso` é um dicionário
+        com a contagem de tokens de cada parte do prompt.
+        """
+        tokens_sistema = self.conta(sistema) + TOKENS_POR_MENSAGEM
+        tokens_pergunta = self.conta(pergunta) + TOKENS_POR_MENSAGEM
+        disponivel = self.limite - tokens_sistema
+        if tokens_pergunta > disponivel:
+            pergunta = trunca_tokens(pergunta, max(disponivel - TOKENS_POR_MENSAGEM, 0), self.modelo)
+            tokens_pergunta = self.conta(pergunta) + TOKENS_POR_MENSAGEM
+        disponivel = max(disponivel - tokens_pergunta, 0)
+
+        custos_trechos = [self.conta(trecho['texto']) for trecho in trechos]
+        selecionados = []
+        tokens_contexto = 0
+        teto_contexto = int(disponivel * self.fracao_contexto)
+        for posicao, custo in enumerate(custos_trechos):
+            if tokens_contexto + custo > teto_contexto:
+                break
+            selecionados.append(posicao)
+            tokens_contexto += custo
+        if not selecionados and trechos and teto_contexto > 0:
+            # Nem o trecho mais relevante cabe inteiro: envia o início dele
+            texto = trunca_tokens(trechos[0]['texto'], teto_contexto, self.modelo)
+            trechos = [{**trechos[0], 'texto': texto}] + list(trechos[1:])
+            custos_trechos[0] = self.conta(texto)
+            selecionados.append(0)
+            tokens_contexto = custos_trechos[0]
+
+        mensagens = list(historico)
+        tokens_historico = 0
+        inicio = len(mensagens)
+        while inicio > 0:
+            custo = self.conta(mensagens[inicio - 1].content) + TOKENS_POR_MENSAGEM
+            if tokens_contexto + tokens_historico + custo > disponivel:
+                break
+            tokens_historico += custo
+            inicio -= 1
+        mensagens = mensagens[inicio:]
+
+        for posicao in range(len(selecionados), len(trechos)):
+            custo = custos_trechos[posicao]
+            if tokens_contexto + tokens_historico + custo > disponivel:
+                break
+            selecionados.append(posicao)
+            tokens_contexto += custo
+
+        uso = {
+            'sistema': tokens_sistema,
+            'contexto': tokens_contexto,
+            'historico': tokens_historico,
+            'pergunta': tokens_pergunta,
+            'total': tokens_sistema + tokens_contexto + tokens_historico + tokens_pergunta,
+            'limite': self.limite,
+            'janela': self.janela,
+            'trechos_enviados': len(selecionados),
+            'trechos_descartados': len(trechos) - len(selecionados),
+            'mensagens_enviadas': len(mensagens),
+            'mensagens_descartadas': inicio,
+        }
+        return [trechos[posicao] for posicao in sorted(selecionados)], mensagens, pergunta, uso
@@ -0,0 +1,52 @@
+"""
+Recuperação de trechos relevantes dos documentos carregados.
+
+Os documentos são divididos em trechos uma única vez, ao iniciar o assistente,
+e a cada pergunta apenas os trechos mais relevantes entram no prompt.
+"""
+from busca_bm25 import IndiceBM25
+
+
+TAMANHO_TRECHO = 1500
+SOBREPOSICAO_TRECHO = 200
+TOP_K_TRECHOS = 6
+
+def _divisor(tamanho=TAMANHO_TRECHO, sobreposicao=SOBREPOSICAO_TRECHO):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=tamanho,
+        chunk_overlap=sobreposicao,
+        separators=['\n\n', '\n', '. ', ' ', '']
+    )
+
+
+def dividir_paginas(paginas, fonte=''):
+    """
+    Gera os trechos de um documento página a página, a partir de pares
+    (número da página ou None, texto), sem montar o texto completo.
+    """
+    divisor = _divisor()
+    for numero, texto in paginas:
+        for parte in divisor.split_text(texto or ''):
+            if parte.strip():
+                yield {'texto': parte, 'fonte': fonte, 'pagina': numero}
+
+
+def cria_indice(paginas, fonte=''):
+    """Divide as páginas em trechos e monta o índice de busca (BM25 por padrão), incrementalmente."""
+    return IndiceBM25(dividir_paginas(paginas, fonte))
+
+
+def formata_contexto(trechos):
+    """Formata os trechos recuperados para inserção no prompt."""
+    if not trechos:
+        return 'Nenhum trecho relevante encontrado no documento para esta pergunta.'
+    partes = []
+    for numero, trecho in enumerate(trechos, start=1):
+        referencias = [trecho['fonte']] if trecho.get('fonte') else []
+        if trecho.get('pagina'):
+            referencias.append(f"p. {trecho['pagina']}")
+        origem = f" ({', '.join(referencias)})" if referencias else ''
+        partes.append(f"[Trecho {numero}{origem}]\n{trecho['texto']}")
+    return '\n\n'.join(partes)
@@ -0,0 +1,84 @@
+"""
+Segmentação do áudio nas pausas naturais da fala.
+
+Em vez de cortar o áudio a cada 60 segundos (o que parte palavras ao meio),
+calcula a energia RMS de quadros curtos com NumPy e corta cada segmento no
+ponto de menor energia entre uma duração mínima e uma máxima. O cálculo é
+feito em blocos sobre o buffer PCM original, sem cópias do áudio inteiro,
+e roda muitas vezes mais rápido que o tempo real em CPU.
+"""
+import numpy as np
+
+
+DURACAO_MINIMA = 15.0  # segundos
+DURACAO_MAXIMA = 50.0  # segundos; abaixo do limite do Google Web Speech
+QUADRO_MS = 30
+SUAVIZACAO_MS = 300  # pausas mais curtas que isso são ignoradas
+QUADROS_POR_BLOCO = 8192
+
+_TIPOS_PCM = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def amostras_pcm(pcm, largura):
+    """
+    Visão NumPy (sem cópia) das amostras de um buffer PCM mono. Amostras de
+    24 bits, que não têm tipo NumPy próprio, são convertidas para int32.
+    """
+    if largura == 3:
+        return _amostras_24_bits(pcm)
+    if largura not in _TIPOS_PCM:
+        raise ValueError(f'Largura de amostra PCM não suportada: {largura} bytes')
+    return np.frombuffer(pcm, dtype=_TIPOS_PCM[largura])
+
+
+def _amostras_24_bits(pcm):
+    octetos = np.frombuffer(pcm, dtype=np.uint8)
+    trios = octetos[:len(octetos) // 3 * 3].reshape(-1, 3).astype(np.int32)
+    amostras = trios[:, 0] | (trios[:, 1] << 8) | (trios[:, 2] << 16)
+    # Estende o sinal do bit 23
+    return (amostras << 8) >> 8
+
+
+def energia_rms(amostras, tamanho_quadro):
+    """Energia RMS de cada quadro completo de `tamanho_quadro` amostras."""
+    total_quadros = len(amostras) // tamanho_quadro
+    energia = np.empty(total_quadros, dtype=np.float32)
+    centro = 128.0 if amostras.dtype == np.uint8 else 0.0
+    for inicio in range(0, total_quadros, QUADROS_POR_BLOCO):
+        fim = min(inicio + QUADROS_POR_BLOCO, total_quadros)
+        bloco = amostras[inicio * tamanho_quadro:fim * tamanho_quadro].astype(np.float32)
+        bloco -= centro
+        bloco = bloco.reshape(fim - inicio, tamanho_quadro)
+        energia[inicio:fim] = np.sqrt(np.einsum('ij,ij->i', bloco, bloco) / tamanho_quadro)
+    return energia
+
+
+def segmentar_por_silencio(pcm, taxa, largura, duracao_minima=DURACAO_MINIMA, duracao_maxima=DURACAO_MAXIMA,
+                           quadro_ms=QUADRO_MS):
+    """
+    Divide o áudio nas pausas, respeitando as durações mínima e máxima.
+
+    Retorna uma lista de pares (amostra inicial, amostra final) que cobre o
+    áudio inteiro, sem sobreposição nem lacunas.
+    """
+    amostras = amostras_pcm(pcm, largura)
+    total = len(amostras)
+    tamanho_quadro = max(1, taxa * quadro_ms // 1000)
+    quadros_min = max(1, int(duracao_minima * taxa) // tamanho_quadro)
+    quadros_max = max(quadros_min + 1, int(duracao_maxima * taxa) // tamanho_quadro)
+
+    energia = energia_rms(amostras, tamanho_quadro)
+    janela = max(1, SUAVIZACAO_MS // quadro_ms)
+    if len(energia) >= janela:
+        energia = np.convolve(energia, np.ones(janela, dtype=np.float32) / janela, mode='same')
+
+    segmentos = []
+    inicio = 0  # em quadros
+    while len(energia) - inicio > quadros_max:
+        candidatos = energia[inicio + quadros_min:inicio + quadros_max]
+        corte = inicio + quadros_min + int(np.argmin(candidatos))
+        segmentos.append((inicio * tamanho_quadro, corte * tamanho_quadro))
+        inicio = corte
+    if inicio * tamanho_quadro < total:
+        segmentos.append((inicio * tamanho_quadro, total))
+    return segmentos
@@ -0,0 +1,6 @@
+from checa_importacao import checa_importacao
+
+
+def test_importacao_do_app_dentro_do_orcamento():
+    # Falha se o app passar do orçamento ou carregar dependências pesadas na importação
+    assert checa_importacao()
@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+
+from notion_tabela import consulta_tabela, tabela_notion, texto_resultado
+
+
+HOJE = datetime.date(2026, 10, 18)
+
+
+def _titulo(texto):
+    return {'type': 'title', 'title': [{'plain_text': texto}]}
+
+
+def _select(nome):
+    return {'type': 'select', 'select': {'name': nome} if nome else None}
+
+
+def _data(inicio):
+    return {'type': 'date', 'date': {'start': inicio} if inicio else None}
+
+
+def _numero(valor):
+    return {'type': 'number', 'number': valor}
+
+
+def _tags(*nomes):
+    return {'type': 'multi_select', 'multi_select': [{'name': nome} for nome in nomes]}
+
+
+def _checkbox(valor):
+    return {'type': 'checkbox', 'checkbox': valor}
+
+
+@pytest.fixture
+def tabela():
+    linhas = [
+        ('1', 'P1', 'Marcada', '2026-11-05', 10, ('Júri', 'Urgente'), True),
+        ('2', 'P2', 'Adiada', '2026-11-20T14:00:00.000-03:00', 20, ('Júri',), False),
+        ('3', 'P3', 'Marcada', '2026-12-01', None, (), True),
+        ('4', 'P4', None, None, 5, ('Urgente',), None),
+    ]
+    return tabela_notion([
+        {'id': id_pagina, 'propriedades': {
+            'Processo': _titulo(processo), 'Status': _select(status), 'Data da sessão': _data(data),
+            'Valor': _numero(valor), 'Tags': _tags(*tags),
+            'Réu preso': _checkbox(preso) if preso is not None else {'type': 'checkbox', 'checkbox': False},
+        }}
+        for id_pagina, processo, status, data, valor, tags, preso in linhas
+    ])
+
+
+def test_colunas_tipadas(tabela):
+    assert str(tabela['Processo'].dtype) == 'string'
+    assert str(tabela['Status'].dtype) == 'category'
+    assert str(tabela['Valor'].dtype) == 'Float64'
+    assert str(tabela['Réu preso'].dtype) == 'boolean'
+    assert tabela['Data da sessão'].dtype.kind == 'M'
+    assert tabela.loc['2', 'Data da sessão'] == datetime.datetime(2026, 11, 20, 14, 0)
+    assert tabela.loc['1', 'Tags'] == ['Júri', 'Urgente']
+    assert tabela.loc['3', 'Tags'] == []
+
+
+def test_contagem_com_filtros(tabela):
+    resposta = consulta_tabela('Quantas sessões estão marcadas para novembro?', tabela, HOJE)
+    assert resposta['operacao'] == 'contagem'
+    assert resposta['resultado']['quantidade'].tolist() == [1]
+    assert resposta['cita_banco']
+
+
+def test_agregacao_por_multi_select(tabela):
+    resposta = consulta_tabela('soma do valor por tags', tabela, HOJE)
+    resultado = dict(zip(resposta['resultado']['Tags'], resposta['resultado']['soma de Valor']))
+    assert resultado == {'Júri': 30.0, 'Urgente': 15.0}
+
+
+def test_contagem_por_multi_select(tabela):
+    resposta = consulta_tabela('quantos processos por tags?', tabela, HOJE)
+    resultado = dict(zip(resposta['resultado']['Tags'], resposta['resultado']['quantidade']))
+    assert resultado == {'Júri': 2, 'Urgente': 2}
+
+
+def test_checkbox_negado(tabela):
+    resposta = consulta_tabela('quantos processos sem réu preso?', tabela, HOJE)
+    assert resposta['resultado']['quantidade'].tolist() == [2]
+
+
+def test_contagem_que_nao_cita_o_banco(tabela):
+    # Sem citar o banco nem filtrar, a contagem seria o total de linhas: nada é injetado
+    assert consulta_tabela('quantas testemunhas podem ser arroladas no plenário?', tabela, HOJE) is None
+
+
+def test_periodo_sem_citar_o_banco_so_complementa(tabela):
+    resposta = consulta_tabela('quantos prazos vencem em novembro?', tabela, HOJE)
+    assert resposta['filtros'] and not resposta['cita_banco']
+
+
+def test_pergunta_nao_estruturada(tabela):
+    assert consulta_tabela('qual a tese do marco temporal?', tabela, HOJE) is None
+
+
+def test_texto_resultado_da_listagem(tabela):
+    resposta = consulta_tabela('liste os processos adiados', tabela, HOJE)
+    texto = texto_resultado(resposta, len(tabela))
+    assert 'Status em Adiada' in texto
+    assert 'P2' in texto and 'P1' not in texto
@@ -0,0 +1,52 @@
+import pytest
+import streamlit as st
+
+import loaders
+from notion_consulta import ConsultaNotion
+from notion_espelho import EspelhoNotion
+
+
+class _Bancos:
+    def retrieve(self, database_id):
+        return {'properties': {'Processo': {'id': 'title', 'type': 'title'},
+                               'Status': {'id': 'st', 'type': 'select'}}}
+
+    def query(self, **parametros):
+        linhas = [
+            {'id': f'p{numero}', 'created_time': f'2026-01-0{numero}T00:00:00.000Z',
+             'last_edited_time': f'2026-01-0{numero}T00:00:00.000Z',
+             'properties': {'Processo': {'type': 'title', 'title': [{'plain_text': f'P{numero}'}]},
+                            'Status': {'type': 'select', 'select': {'name': status}}}}
+            for numero, status in ((1, 'Marcada'), (2, 'Adiada'), (3, 'Marcada'))
+        ]
+        return {'results': linhas, 'has_more': False}
+
+
+class _Notion:
+    databases = _Bancos()
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    espelho = EspelhoNotion(str(tmp_path / 'notion.db'))
+    espelho.sincronizar(_Notion(), 'banco', 'banco', consulta=ConsultaNotion())
+    monkeypatch.setattr(loaders, 'EspelhoNotion', lambda: espelho)
+    st.session_state['bancos_notion'] = {'banco': True}
+    st.session_state['tabelas_notion'] = {}
+    yield
+    st.session_state.clear()
+
+
+def test_contagem_sobre_outro_assunto_nao_injeta_nada(banco):
+    assert loaders.resposta_estruturada_notion('quantas testemunhas podem ser arroladas no plenário?') == ([], [])
+
+
+def test_contagem_que_cita_o_banco(banco):
+    principais, complementares = loaders.resposta_estruturada_notion('quantos processos estão marcados?')
+    assert complementares == []
+    assert len(principais) == 1 and 'quantidade' in principais[0]['texto'] and ' 2' in principais[0]['texto']
+
+
+def test_banco_removido_nao_responde(banco):
+    loaders.esquecer_banco_notion('banco')
+    assert loaders.resposta_estruturada_notion('quantos processos estão marcados?') == ([], [])
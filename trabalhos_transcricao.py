@@ -0,0 +1,129 @@
+"""
+Transcrições em segundo plano, com resultado parcial utilizável.
+
+Um TrabalhoTranscricao roda em um thread próprio: extrai o áudio, reconhece os
+trechos (ver transcricao.transcrever_pcm) e acumula cada segmento assim que ele
+termina. A interface consulta o trabalho periodicamente para mostrar o
+progresso, medido em segundos de áudio concluídos, e para reindexar o texto
+parcial, de modo que o chat já responde sobre o começo da gravação enquanto o
+resto ainda é processado.
+
+O trabalho não usa o Streamlit (o thread não tem contexto de sessão). Trabalhos
+em andamento ficam em um registro do processo, pelo hash da mídia: enviar o
+mesmo arquivo de novo, em outra sessão ou após um reinício do script,
+reaproveita o trabalho existente em vez de começar outro.
+"""
+import os
+import threading
+
+from transcricao import (checkpoint_para, extrair_pcm, juntar_textos, obter_backend, transcricao_salva,
+                         transcrever_pcm)
+
+
+_trava_registro = threading.Lock()
+TRABALHOS = {}  # hash da mídia -> TrabalhoTranscricao em andamento
+
+
+class TrabalhoTranscricao:
+    """Transcrição de uma mídia, executada em segundo plano."""
+
+    def __init__(self, nome, hash_midia, caminho=None, backend=None, remover_arquivo=True):
+        self.nome = nome
+        self.hash_midia = hash_midia
+        self.caminho = caminho
+        self.backend = backend or obter_backend()
+        self.remover_arquivo = remover_arquivo
+        self.estado = 'aguardando'  # 'extraindo', 'transcrevendo', 'concluido' ou 'erro'
+        self.erro = None
+        self.segundos_total = 0.0
+        self.segundos_concluidos = 0.0
+        self.versao = 0  # muda a cada segmento concluído
+        self._segmentos = {}
+        self._trava = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def concluido(cls, nome, hash_midia, segmentos):
+        """Trabalho já terminado, a partir de segmentos salvos."""
+        trabalho = cls(nome, hash_midia)
+        for indice, segmento in enumerate(segmentos):
+            trabalho._registrar(indice, segmento)
+        trabalho.segundos_total = trabalho.segundos_concluidos
+        trabalho.estado = 'concluido'
+        return trabalho
+
+    @property
+    def ativo(self):
+        return self.estado in ('aguardando', 'extraindo', 'transcrevendo')
+
+    @property
+    def progresso(self):
+        """Fração do áudio já transcrita (0 a 1)."""
+        if self.estado == 'concluido':
+            return 1.0
+        if not self.segundos_total:
+            return 0.0
+        return min(1.0, self.segundos_concluidos / self.segundos_total)
+
+    @property
+    def duracao(self):
+        return self.segundos_total
+
+    def segmentos(self):
+        """Segmentos concluídos até agora, em ordem."""
+        with self._trava:
+            return [self._segmentos[indice] for indice in sorted(self._segmentos)]
+
+    def texto(self):
+        return juntar_textos(segmento['texto'] for segmento in self.segmentos())
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name=f'transcricao-{self.nome}', daemon=True)
+        self._thread.start()
+        return self
+
+    def _registrar(self, indice, segmento):
+        with self._trava:
+            anterior = self._segmentos.get(indice)
+            if anterior is not None:
+                self.segundos_concluidos -= anterior['fim'] - anterior['inicio']
+            self._segmentos[indice] = segmento
+            self.segundos_concluidos += segmento['fim'] - segmento['inicio']
+            self.versao += 1
+
+    def _executar(self):
+        try:
+            self.estado = 'extraindo'
+            pcm, taxa, largura = extrair_pcm(self.caminho)
+            self.segundos_total = len(pcm) / (taxa * largura)
+            self.estado = 'transcrevendo'
+            transcrever_pcm(pcm, taxa, largura, backend=self.backend,
+                            checkpoint=checkpoint_para(self.hash_midia, self.backend), ao_segmento=self._registrar)
+            self.estado = 'concluido'
+        except Exception as e:
+            self.erro = str(e)
+            self.estado = 'erro'
+        finally:
+            if self.remover_arquivo and self.caminho and os.path.exists(self.caminho):
+                os.remove(self.caminho)
+            with _trava_registro:
+                if TRABALHOS.get(self.hash_midia) is self:
+                    del TRABALHOS[self.hash_midia]
+
+
+def iniciar_trabalho(nome, hash_midia, caminho, backend=None):
+    """
+    Trabalho de transcrição para a mídia: concluído (se já salvo), o que já está
+    em andamento para o mesmo conteúdo, ou um novo, iniciado em segundo plano.
+    O arquivo em `caminho` passa a ser do trabalho, que o remove ao terminar.
+    """
+    backend = backend or obter_backend()
+    salvos = transcricao_salva(hash_midia, backend)
+    with _trava_registro:
+        existente = TRABALHOS.get(hash_midia)
+        if salvos is None and existente is None:
+            TRABALHOS[hash_midia] = TrabalhoTranscricao(nome, hash_midia, caminho, backend).iniciar()
+            return TRABALHOS[hash_midia]
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    return existente if salvos is None else TrabalhoTranscricao.concluido(nome, hash_midia, salvos)
@@ -0,0 +1,307 @@
+"""
+Motor de transcrição: divisão do áudio em trechos e reconhecimento de fala em
+paralelo, com o serviço de reconhecimento atrás de uma interface (BackendASR).
+
+O áudio é extraído uma única vez pelo ffmpeg para PCM mono 16 kHz em memória
+(sem decodificar o vídeo nem gravar WAV intermediário) e fatiado nas
+pausas da fala em trechos sem cópia (memoryview), sem arquivos temporários
+por trecho.
+
+Os trechos são enviados ao backend por um pool limitado de threads (as
+chamadas são dominadas por espera de rede). Cada trecho é tentado novamente
+com espera exponencial em caso de falha de API, e os textos são devolvidos na
+ordem original dos trechos, independentemente da ordem em que terminam. Com
+o hash da mídia, o progresso é salvo trecho a trecho (checkpoint_transcricao).
+
+Backends disponíveis (variável JURIA_BACKEND_ASR):
+  - 'google': Google Web Speech (padrão);
+  - 'sphinx', 'whisper', 'vosk', ...: outros motores do speech_recognition;
+  - 'falso': saída determinística e offline, para testes e benchmarks.
+"""
+from abc import ABC, abstractmethod
+import hashlib
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from checkpoint_transcricao import CheckpointTranscricao, chave_transcricao
+from segmentacao_audio import segmentar_por_silencio
+
+
+MAX_WORKERS = int(os.getenv('JURIA_TRANSCRICAO_WORKERS', '4'))
+TENTATIVAS = 3
+ESPERA_INICIAL = 1.0  # segundos; dobra a cada nova tentativa
+IDIOMA = 'pt-BR'
+TAXA_ASR = 16000  # Hz; suficiente para reconhecimento de fala
+TAMANHO_BLOCO_PCM = 1 << 20
+BACKEND_PADRAO = os.getenv('JURIA_BACKEND_ASR', 'google')
+
+TEXTO_INAUDIVEL = '[Trecho inaudível]'
+TEXTO_ERRO_API = '[Erro na API de reconhecimento]'
+
+# Formato do idioma por motor do speech_recognition (o padrão é o código BCP 47, ex.: 'pt-BR')
+MOTORES_ISO_639_1 = {'whisper_api', 'openai', 'groq', 'faster_whisper'}
+MOTORES_SEM_IDIOMA = {'wit', 'houndify', 'vosk'}
+NOMES_IDIOMAS = {'pt': 'portuguese', 'en': 'english', 'es': 'spanish'}  # recognize_whisper
+
+
+def idioma_do_motor(motor, idioma):
+    """Idioma ('pt-BR') no formato esperado pelo motor, ou None se o motor não recebe idioma."""
+    if motor in MOTORES_SEM_IDIOMA:
+        return None
+    base = idioma.split('-')[0].lower()
+    if motor == 'whisper':
+        return NOMES_IDIOMAS.get(base, base)
+    if motor in MOTORES_ISO_639_1:
+        return base
+    return idioma
+
+
+class BackendASR(ABC):
+    """Interface de um serviço de reconhecimento de fala."""
+
+    nome = 'base'
+
+    @abstractmethod
+    def reconhecer(self, audio_data):
+        """Texto reconhecido em um trecho (sr.AudioData ou objeto com os mesmos atributos)."""
+
+
+class BackendSpeechRecognition(BackendASR):
+    """
+    Qualquer motor `recognize_<nome>` do speech_recognition, com novas tentativas
+    e espera exponencial em erro de API.
+    """
+
+    def __init__(self, motor='google', idioma=IDIOMA, tentativas=TENTATIVAS, espera_inicial=ESPERA_INICIAL,
+                 **opcoes):
+        self.nome = motor
+        self.idioma = idioma
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.opcoes = opcoes
+
+    def reconhecer(self, audio_data):
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        metodo = getattr(recognizer, f'recognize_{self.nome}')
+        opcoes = dict(self.opcoes)
+        idioma = idioma_do_motor(self.nome, self.idioma)
+        if idioma is not None:
+            opcoes.setdefault('language', idioma)
+        for tentativa in range(self.tentativas):
+            try:
+                return metodo(audio_data, **opcoes)
+            except sr.UnknownValueError:
+                return TEXTO_INAUDIVEL
+            except sr.RequestError:
+                if tentativa == self.tentativas - 1:
+                    return TEXTO_ERRO_API
+                # Pequena variação aleatória para que os workers não repitam juntos
+                time.sleep(self.espera_inicial * (2 ** tentativa) * (1 + random.random() / 4))
+        return TEXTO_ERRO_API
+
+
+class BackendGoogle(BackendSpeechRecognition):
+    """Google Web Speech, o reconhecedor usado originalmente pelo app."""
+
+    def __init__(self, **opcoes):
+        super().__init__('google', **opcoes)
+
+
+class BackendFalso(BackendASR):
+    """
+    Backend offline e determinístico: o texto depende só do conteúdo do trecho.
+    `atraso_por_segundo` simula a latência de um serviço real (segundos de espera
+    por segundo de áudio).
+    """
+
+    nome = 'falso'
+
+    def __init__(self, atraso_por_segundo=0.0):
+        self.atraso_por_segundo = atraso_por_segundo
+
+    def reconhecer(self, audio_data):
+        dados = audio_data.frame_data
+        duracao = len(dados) / (audio_data.sample_rate * audio_data.sample_width)
+        if self.atraso_por_segundo:
+            time.sleep(duracao * self.atraso_por_segundo)
+        resumo = hashlib.blake2b(dados, digest_size=4).hexdigest()
+        return f'trecho {resumo} de {duracao:.2f} segundos'
+
+
+def obter_backend(nome=None, **opcoes):
+    """Cria o backend pelo nome; `None` usa JURIA_BACKEND_ASR."""
+    nome = nome or BACKEND_PADRAO
+    if nome == 'falso':
+        return BackendFalso(**opcoes)
+    if nome == 'google':
+        return BackendGoogle(**opcoes)
+    return BackendSpeechRecognition(nome, **opcoes)
+
+
+def reconhecer_em_paralelo(itens, reconhecer, max_workers=MAX_WORKERS, ao_concluir=None, ao_resultado=None):
+    """
+    Aplica `reconhecer(item)` a cada item em um pool de threads.
+
+    Retorna a lista de textos na mesma ordem de `itens`. `ao_concluir(concluidos, total)`
+    e `ao_resultado(posicao, texto)` são chamadas no thread de quem chamou a função a
+    cada item terminado.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+    textos = [None] * len(itens)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(itens)))) as pool:
+        futuros = {pool.submit(reconhecer, item): posicao for posicao, item in enumerate(itens)}
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            posicao = futuros[futuro]
+            textos[posicao] = futuro.result()
+            if ao_resultado:
+                ao_resultado(posicao, textos[posicao])
+            if ao_concluir:
+                ao_concluir(concluidos, len(itens))
+    return textos
+
+
+def caminho_ffmpeg():
+    """Executável do ffmpeg: o do sistema ou, na falta dele, o empacotado pelo imageio-ffmpeg."""
+    caminho = shutil.which('ffmpeg')
+    if caminho:
+        return caminho
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        raise RuntimeError('ffmpeg não encontrado: instale o ffmpeg ou o pacote imageio-ffmpeg')
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def extrair_pcm(caminho, taxa=TAXA_ASR):
+    """
+    Extrai só a faixa de áudio de um arquivo de mídia como PCM mono 16 bits na
+    taxa do reconhecedor: (bytes, taxa, 2).
+
+    O ffmpeg não decodifica o vídeo (-vn), faz a mixagem para mono e a
+    reamostragem, e envia as amostras por um pipe: nenhum WAV intermediário é
+    gravado e a memória usada é a do PCM final (~115 MB por hora a 16 kHz).
+    """
+    comando = [
+        caminho_ffmpeg(), '-nostdin', '-hide_banner', '-loglevel', 'error',
+        '-i', caminho, '-map', '0:a:0', '-vn', '-sn', '-dn',
+        '-ac', '1', '-ar', str(taxa), '-f', 's16le', '-acodec', 'pcm_s16le', '-',
+    ]
+    pcm = bytearray()
+    # stderr vai para um arquivo: com dois pipes, um stderr cheio travaria o
+    # ffmpeg enquanto o stdout é lido até o fim
+    with tempfile.TemporaryFile() as saida_erro:
+        with subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=saida_erro) as processo:
+            while True:
+                bloco = processo.stdout.read(TAMANHO_BLOCO_PCM)
+                if not bloco:
+                    break
+                pcm += bloco
+        saida_erro.seek(0)
+        erro = saida_erro.read().decode('utf-8', 'replace').strip()[-2000:]
+    if processo.returncode != 0:
+        raise RuntimeError(f'Falha ao extrair o áudio com ffmpeg: {erro or processo.returncode}')
+    return pcm, taxa, 2
+
+
+def segmentar_audio(pcm, taxa, largura):
+    """
+    Divide PCM mono nas pausas da fala (ver segmentacao_audio).
+
+    Retorna uma lista de dicionários {'inicio', 'fim', 'audio'}, com os tempos
+    em segundos e o trecho como sr.AudioData. Os trechos são memoryviews do
+    mesmo buffer decodificado: nada é copiado nem gravado em disco.
+    """
+    import speech_recognition as sr
+
+    buffer = memoryview(pcm)
+    segmentos = []
+    for inicio, fim in segmentar_por_silencio(pcm, taxa, largura):
+        segmentos.append({
+            'inicio': inicio / taxa,
+            'fim': fim / taxa,
+            'audio': sr.AudioData(buffer[inicio * largura:fim * largura], taxa, largura),
+        })
+    return segmentos
+
+
+def juntar_textos(textos):
+    """Junta os textos reconhecidos, na ordem dos trechos."""
+    return ' '.join(texto.strip() for texto in textos if texto and texto.strip())
+
+
+def checkpoint_para(hash_midia, backend):
+    """Checkpoint do trabalho de transcrever a mídia `hash_midia` com `backend`."""
+    return CheckpointTranscricao(chave_transcricao(hash_midia, backend.nome, getattr(backend, 'idioma', '')))
+
+
+def transcricao_salva(hash_midia, backend=None):
+    """Segmentos de uma transcrição já concluída dessa mídia, ou None."""
+    return checkpoint_para(hash_midia, backend or obter_backend()).concluida()
+
+
+def transcrever_pcm(pcm, taxa, largura, backend=None, max_workers=MAX_WORKERS, ao_concluir=None, checkpoint=None,
+                    ao_segmento=None):
+    """
+    Segmenta o PCM mono nas pausas e reconhece os trechos em paralelo.
+
+    Retorna a lista de segmentos {'inicio', 'fim', 'texto'} em ordem; o texto
+    completo é `juntar_textos(s['texto'] for s in segmentos)`. Com `checkpoint`,
+    só os trechos ainda não salvos são reconhecidos, e cada trecho é salvo ao
+    terminar. `ao_segmento(indice, segmento)` recebe cada segmento pronto
+    (inclusive os vindos do checkpoint), no thread de quem chamou a função.
+    """
+    backend = backend or obter_backend()
+    segmentos = segmentar_audio(pcm, taxa, largura)
+    total = len(segmentos)
+    resultado = [None] * total
+    for indice, salvo in (checkpoint.iniciar(total) if checkpoint else {}).items():
+        resultado[indice] = salvo
+        if ao_segmento:
+            ao_segmento(indice, salvo)
+    pendentes = [indice for indice in range(total) if resultado[indice] is None]
+    prontos = total - len(pendentes)
+
+    def guardar(posicao, texto):
+        indice = pendentes[posicao]
+        segmento = {'inicio': segmentos[indice]['inicio'], 'fim': segmentos[indice]['fim'], 'texto': texto}
+        resultado[indice] = segmento
+        # Falhas de API não são salvas, para serem tentadas de novo depois
+        if checkpoint and texto != TEXTO_ERRO_API:
+            checkpoint.salvar_trecho(indice, segmento)
+        if ao_segmento:
+            ao_segmento(indice, segmento)
+
+    reconhecer_em_paralelo(
+        [segmentos[indice]['audio'] for indice in pendentes], backend.reconhecer, max_workers,
+        ao_concluir=(lambda feitos, _: ao_concluir(prontos + feitos, total)) if ao_concluir else None,
+        ao_resultado=guardar,
+    )
+    if checkpoint:
+        checkpoint.concluir()
+    return resultado
+
+
+def transcrever_arquivo(caminho, backend=None, max_workers=MAX_WORKERS, ao_concluir=None, hash_midia=None):
+    """
+    Extrai o áudio de um arquivo de mídia com o ffmpeg e transcreve (ver transcrever_pcm).
+    Com `hash_midia`, o trabalho é retomável e uma transcrição já concluída é
+    devolvida sem decodificar o áudio.
+    """
+    backend = backend or obter_backend()
+    checkpoint = checkpoint_para(hash_midia, backend) if hash_midia else None
+    if checkpoint:
+        concluida = checkpoint.concluida()
+        if concluida is not None:
+            return concluida
+
+    return transcrever_pcm(*extrair_pcm(caminho), backend=backend,
+                           max_workers=max_workers, ao_concluir=ao_concluir, checkpoint=checkpoint)
@@ -0,0 +1,62 @@
+"""
+Gravação em disco de arquivos enviados pelo Streamlit, sem cópias.
+
+O UploadedFile do Streamlit já guarda o arquivo inteiro em memória (é um
+BytesIO). Em vez de `arquivo.read()`, que cria mais uma cópia do tamanho do
+arquivo, os dados são percorridos em blocos de tamanho fixo sobre um memoryview
+do buffer original; o hash é calculado na mesma passada da gravação. O uso de
+memória adicional fica limitado a um bloco, qualquer que seja o tamanho do
+arquivo.
+"""
+import hashlib
+import os
+import tempfile
+
+
+TAMANHO_BLOCO = 1 << 20  # 1 MB
+
+
+def blocos_upload(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera o conteúdo do arquivo em blocos. Objetos com `getbuffer()` (BytesIO,
+    UploadedFile) são fatiados sem cópia; os demais são lidos com `read()`.
+    """
+    if hasattr(arquivo, 'getbuffer'):
+        with arquivo.getbuffer() as buffer:
+            for inicio in range(0, len(buffer), tamanho_bloco):
+                with buffer[inicio:inicio + tamanho_bloco] as bloco:
+                    yield bloco
+        return
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+    while True:
+        bloco = arquivo.read(tamanho_bloco)
+        if not bloco:
+            break
+        yield bloco
+
+
+def hash_upload(arquivo):
+    """SHA-256 (hexadecimal) do conteúdo do arquivo, sem copiá-lo."""
+    hash_conteudo = hashlib.sha256()
+    for bloco in blocos_upload(arquivo):
+        hash_conteudo.update(bloco)
+    return hash_conteudo.hexdigest()
+
+
+def salvar_upload(arquivo, sufixo=''):
+    """
+    Grava o arquivo em um arquivo temporário, calculando o hash na mesma passada.
+    Retorna (caminho, hash hexadecimal); quem chama remove o arquivo.
+    """
+    hash_conteudo = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=sufixo, delete=False) as temp:
+        try:
+            for bloco in blocos_upload(arquivo):
+                hash_conteudo.update(bloco)
+                temp.write(bloco)
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+    return temp.name, hash_conteudo.hexdigest()